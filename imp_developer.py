@@ -22,16 +22,30 @@
 # ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 # OTHER DEALINGS IN THE SOFTWARE.
 
+import array
 import base64
+import binascii
+import bisect
+import collections
+import concurrent.futures
+import copy
 import datetime
+import email.utils
+import hashlib
+import http.client
+import io
 import json
+import mmap
 import os
+import queue
+import random
 import re
+import struct
 import subprocess
 import sys
-import urllib.request
+import threading
+import time
 import urllib.parse
-import urllib.error
 import socket
 import select
 
@@ -41,6 +55,7 @@ import sublime_plugin
 # Import string resources
 from .plugin_resources.strings import *
 from .plugin_resources.node_locator import NodeLocator
+from .plugin_resources.sse_parser import SseParser
 
 # Import third party modules
 from .modules.Sublime_AdvancedNewFile_1_0_0.advanced_new_file.commands import AdvancedNewFileNew
@@ -50,6 +65,12 @@ PL_IMPCENTRAL_API_URL_BASE  = "https://api.electricimp.com"
 PL_IMPCENTRAL_API_URL_V5    = PL_IMPCENTRAL_API_URL_BASE + "/v5/"
 PL_SETTINGS_FILE            = "ImpDeveloper.sublime-settings"
 PL_DEBUG_FLAG               = "debug"
+PL_PREWARM_FLAG             = "prewarm"
+PL_BUILDER_WORKER_FLAG      = "builder-worker"
+PL_CONSOLE_FLUSH_RATE       = "console-flush-rate"
+PL_CONSOLE_MAX_LINES        = "console-max-lines"
+PL_CONSOLE_MAX_SIZE         = "console-max-size"
+PL_CONSOLE_SPILL_FLAG       = "console-spill-to-file"
 PL_AGENT_URL                = "https://agent.electricimp.com/{}"
 PL_WIN_PROGRAMS_DIR_32      = "C:\\Program Files (x86)\\"
 PL_WIN_PROGRAMS_DIR_64      = "C:\\Program Files\\"
@@ -60,8 +81,34 @@ PL_PLUGIN_STATUS_KEY        = "plugin-status-key"
 PL_KEEP_ALIVE_TIMEOUT       = 60 # impCentral api timeout is 30 seconds
 PL_LONG_POLL_TIMEOUT        = 5  # sec
 PL_LOGS_UPDATE_LONG_PERIOD  = 1000 # ms - waiting for log start command
-PL_LOGS_UPDATE_SHORT_PERIOD = 300  # ms - polling logs
-PL_LOGS_MAX_PER_REQUEST     = 30   # maximum logs to read per request
+PL_LOGS_READ_SIZE           = 65536 # bytes - maximum log stream data read at once
+PL_CONSOLE_FLUSH_RATE_DEFAULT = 30 # console appends per second
+PL_CONSOLE_MAX_LINES_DEFAULT  = 20000   # lines kept in the console
+PL_CONSOLE_MAX_SIZE_DEFAULT   = 4000000 # characters kept in the console
+PL_CONSOLE_TRIM_RATIO       = 0.25 # part of the console limit trimmed at once
+PL_HTTP_POOL_MAX_SIZE       = 4    # maximum idle connections kept per host
+PL_HTTP_POOL_IDLE_TIMEOUT   = 25   # sec - retire connections before the server drops them
+PL_HTTP_MAX_PARALLEL_PAGES  = 4    # maximum pages requested concurrently
+PL_HTTP_CACHE_MAX_SIZE      = 128  # maximum cached impCentral responses
+PL_HTTP_CACHE_TTL           = 30   # sec - serve cached responses without revalidation
+PL_HTTP_CONNECT_TIMEOUT     = 10   # sec
+PL_HTTP_READ_TIMEOUT        = 40   # sec - impCentral api timeout is 30 seconds
+PL_HTTP_MAX_RETRIES         = 3    # retries of the failed requests
+PL_HTTP_BACKOFF_BASE        = 0.5  # sec - the first retry delay, doubles on each retry
+PL_HTTP_BACKOFF_MAX         = 8    # sec - maximum delay between retries
+PL_HTTP_RETRY_AFTER_MAX     = 30   # sec - maximum delay requested with Retry-After
+PL_HTTP_RETRY_TIME_MAX      = 60   # sec - maximum time of a request with all its retries
+PL_HTTP_BREAKER_THRESHOLD   = 5    # failures in a row to stop requesting the cloud
+PL_HTTP_BREAKER_COOLDOWN    = 30   # sec - time to fail fast before the next try
+PL_HTTP_MAX_WORKERS         = 8    # background threads for the impCentral requests
+PL_LIST_PAGE_SIZE           = 100  # items requested per page of the impCentral lists
+PL_TOKEN_REFRESH_MARGIN     = 300  # sec - renew the access token before it expires
+PL_TOKEN_REFRESH_RETRY      = 30   # sec - delay before the next try of a failed renewal
+PL_PREWARM_DELAY            = 2000 # ms - let the window load before prewarming the cloud access
+PL_BUILDER_WORKER_START_TIMEOUT = 10  # sec - time to load the Builder module in the worker
+PL_BUILDER_WORKER_TIMEOUT   = 300  # sec - preprocessing with GitHub includes could be long
+PL_BUILDER_WORKER_RETRY     = 60   # sec - use the Builder processes after the worker failed to start
+PL_SOURCE_MAPS_KEPT         = 20   # deployments which logs could be translated to the original code
 
 # Electric Imp project specific constants
 PR_DEFAULT_PROJECT_NAME  = "electric-imp-project"
@@ -76,6 +123,12 @@ PR_BUILD_DIRECTORY       = "build"
 PR_DEVICE_FILE_NAME      = "device.nut"
 PR_AGENT_FILE_NAME       = "agent.nut"
 PR_PREPROCESSED_PREFIX   = "preprocessed."
+PR_NETWORK_STATS_PREFIX  = "network-stats-"
+PR_BUILD_CACHE_FILE      = "build-cache.json"
+PR_SOURCE_MAP_SUFFIX     = ".map"
+PR_SOURCE_MAPS_DIRECTORY = "source-maps"
+PR_SOURCE_MAPS_INDEX     = "deployments.json"
+PR_CONSOLE_LOG_FILE      = "console.log"
 
 # Electric Imp settings and project properties
 EI_CLOUD_URL                = "cloud-url"
@@ -92,6 +145,7 @@ EI_REFRESH_TOKEN            = "refresh-token"
 EI_PRODUCT_ID               = "product-id"
 EI_DEVICE_GROUP_ID          = "device-group-id"
 EI_DEPLOYMENT_ID            = "deployment-id"
+EI_DEPLOYED_CODE_HASHES     = "deployed-code-hashes"
 
 EI_DEPLOYMENT_NEW           = "deployment-new"
 
@@ -114,7 +168,105 @@ IMPC_DATA_FORMAT   = "%Y-%m-%dT%H:%M:%S.%fZ"
 
 # Global variables
 plugin_settings = None
+settings_cache = None
 project_env_map = {}
+http_connection_pool = None
+http_response_cache = None
+http_single_flight = None
+http_request_policy = None
+imp_central_executor = None
+network_stats = None
+token_refresh_scheduler = None
+# the plugin host thread the commands and the event listeners are run on
+ui_thread = None
+builder_workers = {}
+
+
+class SettingsCache:
+    """Parsed settings files revalidated with the file modification time and size"""
+
+    def __init__(self):
+        # path -> (signature, settings)
+        self.entries = {}
+        # path -> lock of the file updates
+        self.file_locks = {}
+        self.lock = threading.Lock()
+
+    def get_file_lock(self, path):
+        with self.lock:
+            return self.file_locks.setdefault(path, threading.RLock())
+
+    @staticmethod
+    def get_signature(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self, path):
+        try:
+            signature = self.get_signature(path)
+        except OSError:
+            with self.lock:
+                self.entries.pop(path, None)
+            return {}
+
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry is None or entry[0] != signature:
+            # the file is new or edited outside of the plug-in
+            with open(path, encoding="utf-8") as f:
+                entry = (signature, json.load(f))
+            with self.lock:
+                self.entries[path] = entry
+
+        # callers update the settings they loaded
+        return copy.deepcopy(entry[1])
+
+    def store(self, path, settings):
+        signature = self.get_signature(path)
+        with self.lock:
+            self.entries[path] = (signature, copy.deepcopy(settings))
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+
+class SettingsTransaction:
+    """Batches the updates of a settings file into one atomic write"""
+
+    def __init__(self, project_manager, filename):
+        self.project_manager = project_manager
+        self.filename = filename
+        self.file_lock = None
+        self.settings = None
+        self.original = None
+
+    def __enter__(self):
+        path = ProjectManager.get_settings_file_path(self.project_manager.window, self.filename)
+        # the async and UI threads must not update the same file concurrently
+        self.file_lock = ProjectManager.settings_cache().get_file_lock(path)
+        self.file_lock.acquire()
+        self.settings = self.project_manager.load_settings_file(self.filename)
+        self.original = copy.deepcopy(self.settings)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            # nothing is written on errors or if nothing is changed
+            if exc_type is None and self.settings != self.original:
+                self.project_manager.save_settings(self.filename, self.settings)
+        finally:
+            self.file_lock.release()
+
+    def get(self, index, default=None):
+        return self.settings.get(index, default)
+
+    def set(self, index, value):
+        # remove element from the configuration
+        if value is None:
+            self.settings.pop(index, None)
+        else:
+            self.settings[index] = value
 
 
 class ProjectManager:
@@ -123,6 +275,13 @@ class ProjectManager:
     def __init__(self, window):
         self.window = window
 
+    @staticmethod
+    def settings_cache():
+        global settings_cache
+        if not settings_cache:
+            settings_cache = SettingsCache()
+        return settings_cache
+
     @staticmethod
     def get_settings_dir(window):
         project_file_name = window.project_file_name()
@@ -132,8 +291,18 @@ class ProjectManager:
 
     @staticmethod
     def dump_map_to_json_file(filename, map):
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(map, f, indent=4)
+        # write a temporary file and replace the original one with it,
+        # so the file is never left half-written
+        temp_filename = filename + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp"
+        try:
+            with open(temp_filename, "w", encoding="utf-8") as f:
+                json.dump(map, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_filename, filename)
+        finally:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
 
     @staticmethod
     def get_settings_file_path(window, filename):
@@ -147,13 +316,18 @@ class ProjectManager:
         return settings_filename is not None and os.path.exists(settings_filename)
 
     def save_settings(self, filename, settings):
-        self.dump_map_to_json_file(ProjectManager.get_settings_file_path(self.window, filename), settings)
+        path = ProjectManager.get_settings_file_path(self.window, filename)
+        with ProjectManager.settings_cache().get_file_lock(path):
+            self.dump_map_to_json_file(path, settings)
+            ProjectManager.settings_cache().store(path, settings)
+
+    def settings_transaction(self, filename=PR_SETTINGS_FILE):
+        return SettingsTransaction(self, filename)
 
     def load_settings_file(self, filename):
         path = ProjectManager.get_settings_file_path(self.window, filename)
-        if path and os.path.exists(path):
-            with open(path, encoding="utf-8") as f:
-                return json.load(f)
+        if path:
+            return ProjectManager.settings_cache().load(path)
         return {}
 
     def load_settings(self):
@@ -225,6 +399,10 @@ class Env:
 
         # Temp variables
         self.tmp_device_ids = None
+        # the cloud access was prewarmed for the window
+        self.prewarmed = False
+        # the code hash and the errors of the last failed deployment
+        self.failed_deployment = None
 
     @staticmethod
     def For(window):
@@ -242,8 +420,284 @@ class Env:
             log_debug(
                 "  [ ] Adding new project window: " + str(window) +
                 ", total windows now: " + str(len(project_env_map)))
+            if ProjectManager.is_electric_imp_project_window(window):
+                Env.token_refresh_scheduler().schedule(env)
         return env
 
+    def prewarm(self):
+        # prepare the cloud access in background once the project window is opened:
+        # connection, access token, device group, device list and log stream
+        global plugin_settings
+        if self.prewarmed or (plugin_settings and not plugin_settings.get(PL_PREWARM_FLAG, True)):
+            return
+        self.prewarmed = True
+        sublime.set_timeout_async(
+            lambda: ImpCentralAsync.executor().submit(self.__prewarm), PL_PREWARM_DELAY)
+
+    def __prewarm(self):
+        # the prewarming runs on the executor, its failures would be lost otherwise
+        try:
+            self.__prewarm_cloud_access()
+        except Exception as exc:
+            log_debug("Prewarming failed: {}".format(exc))
+
+    def __prewarm_cloud_access(self):
+        settings = self.project_manager.load_settings()
+        cloud_url = settings.get(EI_CLOUD_URL)
+        if not cloud_url:
+            return
+        HTTP.prewarm(cloud_url)
+
+        # renew the access token now if it is about to expire
+        token = self.project_manager.get_access_token_set()
+        if not token or not token.get(EI_ACCESS_TOKEN_EXPIRES_AT) or not token.get(EI_REFRESH_TOKEN):
+            return
+        expires = datetime.datetime.strptime(token[EI_ACCESS_TOKEN_EXPIRES_AT], IMPC_DATA_FORMAT)
+        if (expires - datetime.datetime.utcnow()).total_seconds() < PL_TOKEN_REFRESH_MARGIN:
+            if Env.token_refresh_scheduler().refresh(self):
+                return
+
+        access_token = self.project_manager.get_access_token()
+        device_group_id = settings.get(EI_DEVICE_GROUP_ID)
+        if not access_token or not device_group_id:
+            return
+
+        log_debug("Prewarming the cloud access: " + str(self.window))
+        impcentral = ImpCentral(self)
+        device_group, error = impcentral.get_device_group(access_token, device_group_id)
+        if error:
+            return
+        # the same requests as the log stream start and the device group device selection do,
+        # so they are served from the response cache
+        for fields in [LogManager.DEVICE_FIELDS, ImpSelectDeviceCommand.DEVICE_FIELDS]:
+            devices, error = impcentral.list_devices(access_token, None, device_group_id, fields=fields)
+            if error:
+                return
+        sublime.set_timeout(self.__open_log_stream, 0)
+
+    def __open_log_stream(self):
+        if self.log_manager.state != self.log_manager.IDLE:
+            return
+        # the logs are written to the console as soon as the stream is opened,
+        # they would be lost if the console is not created yet
+        if not self.terminal:
+            self.ui_manager.create_new_console()
+        self.log_manager.start()
+        self.log_manager.update_logs()
+
+    @staticmethod
+    def token_refresh_scheduler():
+        global token_refresh_scheduler
+        if not token_refresh_scheduler:
+            token_refresh_scheduler = TokenRefreshScheduler()
+        return token_refresh_scheduler
+
+
+class TokenRefreshScheduler:
+    """Renews the access tokens in the background before they expire"""
+
+    def __init__(self):
+        # auth file path -> the renewal timer,
+        # the windows of the same project share the timer
+        self.timers = {}
+        self.lock = threading.Lock()
+
+    def schedule(self, env, delay=None):
+        path = ProjectManager.get_settings_file_path(env.window, PR_AUTH_INFO_FILE)
+        if not path:
+            return
+        self.cancel(path)
+
+        token = env.project_manager.get_access_token_set()
+        if not token or not token.get(EI_REFRESH_TOKEN) or not token.get(EI_ACCESS_TOKEN_EXPIRES_AT):
+            return
+        if delay is None:
+            expires = datetime.datetime.strptime(token[EI_ACCESS_TOKEN_EXPIRES_AT], IMPC_DATA_FORMAT)
+            delay = (expires - datetime.datetime.utcnow()).total_seconds() - PL_TOKEN_REFRESH_MARGIN
+
+        log_debug("Access token renewal in " + str(int(max(0, delay))) + " sec: " + path)
+        timer = threading.Timer(max(0, delay), self.__on_timer, [env, path])
+        timer.daemon = True
+        with self.lock:
+            self.timers[path] = timer
+        timer.start()
+
+    def cancel(self, path):
+        with self.lock:
+            timer = self.timers.pop(path, None)
+        if timer:
+            timer.cancel()
+
+    def clear(self):
+        with self.lock:
+            timers, self.timers = list(self.timers.values()), {}
+        for timer in timers:
+            timer.cancel()
+
+    def __on_timer(self, env, path):
+        with self.lock:
+            if self.timers.get(path) is threading.current_thread():
+                del self.timers[path]
+        # the project could be closed or logged out meanwhile
+        env = self.get_live_env(env, path)
+        if not env or not env.project_manager.get_refresh_token():
+            return
+
+        error = self.refresh(env)
+        # invalid credentials require to log in again,
+        # it is handled by the next command
+        if error and error.get("code") != ImpRequest.INVALID_CREDENTIALS:
+            self.schedule(env, PL_TOKEN_REFRESH_RETRY)
+
+    def get_live_env(self, env, path):
+        # the window which has scheduled the renewal could be closed,
+        # while the other windows still use the same auth file
+        if ProjectManager.is_electric_imp_project_window(env.window):
+            return env
+        for window in sublime.windows():
+            if ProjectManager.get_settings_file_path(window, PR_AUTH_INFO_FILE) != path \
+                    or not ProjectManager.is_electric_imp_project_window(window):
+                continue
+            live_env = Env.For(window)
+            if live_env and ProjectManager.is_electric_imp_project_window(live_env.window):
+                return live_env
+            # the project envs are added and removed on the UI thread only
+            sublime.set_timeout(lambda: self.__schedule_for_window(window), 0)
+            return None
+        return None
+
+    def __schedule_for_window(self, window):
+        env = Env.For(window)
+        if env and ProjectManager.is_electric_imp_project_window(env.window):
+            self.schedule(env)
+            return
+        if env:
+            # the env of the closed window is removed like in update_log_windows
+            project_env_map.pop(window.project_file_name(), None)
+            env.log_manager.close_stream()
+        # the new env schedules the renewal
+        Env.get_existing_or_create_env_for(window)
+
+    def refresh(self, env):
+        # renews the access token and stores it in the auth file, returns the impCentral error
+        refresh_token = env.project_manager.get_refresh_token()
+        response, error = ImpCentral(env).refresh_access_token(refresh_token)
+        if error:
+            return error
+
+        # refresh token could be unexpectedly
+        # updated during request
+        if IMPC_REFRESH_TOKEN in response:
+            refresh_token = response[IMPC_REFRESH_TOKEN]
+        with env.project_manager.settings_transaction(PR_AUTH_INFO_FILE) as auth:
+            auth.set(EI_ACCESS_TOKEN, {
+                EI_ACCESS_TOKEN_VALUE: response[IMPC_ACCESS_TOKEN],
+                EI_ACCESS_TOKEN_EXPIRES_AT: response[IMPC_EXPIRES_AT],
+                EI_REFRESH_TOKEN: refresh_token
+            })
+        self.schedule(env)
+        return None
+
+
+class ConsoleWriter:
+    """Buffers the console output and appends it to the console at once
+
+    The lines written between two flushes are coalesced into one append
+    command, the flushes are limited by the console-flush-rate setting.
+    When the console exceeds the console-max-lines or console-max-size
+    limit, the oldest quarter of the limit is trimmed at once and, if
+    console-spill-to-file is set, appended to the build/console.log file."""
+
+    def __init__(self, window):
+        self.window = window
+        self.lines = []
+        self.lock = threading.Lock()
+        self.flush_scheduled = False
+        self.last_flush = 0
+        # the written lines and the append commands they took
+        self.written = 0
+        self.appends = 0
+
+    @staticmethod
+    def get_setting(name, default):
+        global plugin_settings
+        return plugin_settings.get(name, default) if plugin_settings else default
+
+    @staticmethod
+    def get_flush_period():
+        rate = ConsoleWriter.get_setting(PL_CONSOLE_FLUSH_RATE, PL_CONSOLE_FLUSH_RATE_DEFAULT)
+        # no limit for zero or negative rate, the lines written till the next flush are still coalesced
+        return 1.0 / rate if rate > 0 else 0
+
+    def write(self, text):
+        with self.lock:
+            self.lines.append(text)
+            if self.flush_scheduled:
+                return
+            self.flush_scheduled = True
+            delay = self.last_flush + self.get_flush_period() - time.time()
+        sublime.set_timeout(self.flush, max(0, int(delay * 1000)))
+
+    def flush(self):
+        with self.lock:
+            lines = self.lines
+            self.lines = []
+            self.flush_scheduled = False
+            self.last_flush = time.time()
+        if not lines:
+            return
+
+        env = Env.For(self.window)
+        terminal = env.terminal if hasattr(env, "terminal") else None
+        if terminal:
+            terminal.set_read_only(False)
+            terminal.run_command("append", {"characters": "\n".join(lines) + "\n"})
+            self.trim(env, terminal)
+            terminal.set_read_only(True)
+
+        self.written += len(lines)
+        self.appends += 1
+        if len(lines) > 1:
+            log_debug("Console: {} lines coalesced into one append, {} lines in {} appends in total".format(
+                len(lines), self.written, self.appends))
+
+    def get_trim_size(self, terminal):
+        # the size of the oldest console part to be trimmed, zero if the console is within the limits
+        size = terminal.size()
+        trim_size = 0
+        max_lines = self.get_setting(PL_CONSOLE_MAX_LINES, PL_CONSOLE_MAX_LINES_DEFAULT)
+        if max_lines > 0:
+            lines = terminal.rowcol(size)[0]
+            if lines > max_lines:
+                trim_size = terminal.text_point(lines - int(max_lines * (1 - PL_CONSOLE_TRIM_RATIO)), 0)
+        max_size = self.get_setting(PL_CONSOLE_MAX_SIZE, PL_CONSOLE_MAX_SIZE_DEFAULT)
+        if max_size > 0 and size > max_size:
+            # trim whole lines only
+            trim_size = max(trim_size, terminal.full_line(size - int(max_size * (1 - PL_CONSOLE_TRIM_RATIO))).b)
+        return trim_size
+
+    def trim(self, env, terminal):
+        trim_size = self.get_trim_size(terminal)
+        if not trim_size:
+            return
+
+        if self.get_setting(PL_CONSOLE_SPILL_FLAG, False):
+            text = terminal.substr(sublime.Region(0, trim_size))
+            filename = os.path.join(env.project_manager.get_build_directory_path(), PR_CONSOLE_LOG_FILE)
+            sublime.set_timeout_async(lambda: self.spill(filename, text), 0)
+        terminal.run_command("imp_trim_console", {"size": trim_size})
+        log_debug("Console: {} characters trimmed".format(trim_size))
+
+    @staticmethod
+    def spill(filename, text):
+        try:
+            if not os.path.exists(os.path.dirname(filename)):
+                os.makedirs(os.path.dirname(filename))
+            with open(filename, "a", encoding="utf-8") as f:
+                f.write(text)
+        except OSError as error:
+            log_debug("Failed to save the trimmed console output: " + str(error))
+
 
 class UIManager:
     """Electric Imp plugin UI manager"""
@@ -254,6 +708,7 @@ class UIManager:
     def __init__(self, window):
         self.keep_updating_status = False
         self.window = window
+        self.console_writer = ConsoleWriter(window)
 
     def create_new_console(self):
         env = Env.For(self.window)
@@ -263,12 +718,7 @@ class UIManager:
         env.log_manager.last_shown_log = None
 
     def write_to_console(self, text):
-        env = Env.For(self.window)
-        terminal = env.terminal if hasattr(env, "terminal") else None
-        if terminal:
-            terminal.set_read_only(False)
-            terminal.run_command("append", {"characters": text + "\n"})
-            terminal.set_read_only(True)
+        self.console_writer.write(text)
 
     def init_tty(self):
         env = Env.For(self.window)
@@ -331,6 +781,349 @@ class HttpHeaders():
     }
 
 
+class HttpConnectionPool:
+    """Per-host pool of the keep-alive connections shared by all the project windows"""
+
+    def __init__(self, max_size=PL_HTTP_POOL_MAX_SIZE, idle_timeout=PL_HTTP_POOL_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        # (scheme, host) -> list of (connection, last used time) pairs
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def __new_connection(scheme, host, timeout):
+        if scheme == "http":
+            return http.client.HTTPConnection(host, timeout=timeout)
+        return http.client.HTTPSConnection(host, timeout=timeout)
+
+    @staticmethod
+    def __is_alive(connection):
+        # an idle keep-alive socket must not have anything to read,
+        # otherwise the server has closed it or sent an unexpected data
+        sock = connection.sock
+        if sock is None:
+            return False
+        try:
+            rd, wd, ed = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not rd
+
+    def acquire(self, scheme, host, connect_timeout=None):
+        # returns the connection and the flag whether it was re-used
+        key = (scheme, host)
+        now = time.time()
+        with self.lock:
+            connections = self.idle.get(key, [])
+            while connections:
+                connection, last_used = connections.pop()
+                if now - last_used < self.idle_timeout and self.__is_alive(connection):
+                    return connection, True
+                connection.close()
+        return self.__new_connection(scheme, host, connect_timeout), False
+
+    def release(self, scheme, host, connection):
+        key = (scheme, host)
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) >= self.max_size:
+                # retire the least recently used connection
+                oldest, last_used = connections.pop(0)
+                oldest.close()
+            connections.append((connection, time.time()))
+
+    def prewarm(self, scheme, host, connect_timeout=None):
+        # establishes a connection in advance (DNS, TCP and TLS)
+        # unless there is an idle one for the host already
+        connection, reused = self.acquire(scheme, host, connect_timeout)
+        if not reused:
+            connection.connect()
+        self.release(scheme, host, connection)
+
+    def clear(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for connection, last_used in connections:
+                    connection.close()
+            self.idle = {}
+
+
+class HttpResponseCache:
+    """LRU cache of the impCentral read responses revalidated with ETags"""
+
+    def __init__(self, max_size=PL_HTTP_CACHE_MAX_SIZE, ttl=PL_HTTP_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        # (owner, url) -> [response, etag, expires at]
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, owner, url):
+        # returns the response, etag and the flag whether the response is still fresh
+        with self.lock:
+            entry = self.entries.get((owner, url))
+            if entry is None:
+                return None, None, False
+            self.entries.move_to_end((owner, url))
+            return entry[0], entry[1], entry[2] > time.time()
+
+    def put(self, owner, url, response, etag):
+        with self.lock:
+            self.entries[(owner, url)] = [response, etag, time.time() + self.ttl]
+            self.entries.move_to_end((owner, url))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, url_prefix):
+        with self.lock:
+            for key in [key for key in self.entries if key[1].startswith(url_prefix)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class SingleFlight:
+    """Shares one in-flight call and its result between the concurrent callers with the same key"""
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        # key -> the in-flight call
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, func, *args):
+        # returns the result and the flag whether it was shared with another caller
+        with self.lock:
+            call = self.calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self.calls[key] = SingleFlight.Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class HttpRequestPolicy:
+    """Timeouts, retries and circuit breaker of the impCentral requests"""
+
+    # endpoints which are expected to respond slower than the others
+    ENDPOINT_READ_TIMEOUTS = {
+        "deployments": 90,          # the code is compiled by the cloud
+        "conditional_restart": 60
+    }
+    IDEMPOTENT_METHODS = ["GET", "HEAD", "PUT", "DELETE"]
+    # the server declined these requests without processing them
+    # therefore it is safe to retry them for any method
+    RETRY_ALWAYS_CODES = [429, 503]
+    RETRY_IDEMPOTENT_CODES = [500, 502, 504]
+    # the cloud or its gateway is unavailable, the other errors
+    # are responses of the running service and don't open the circuit
+    BREAKER_FAILURE_CODES = [502, 503, 504]
+
+    def __init__(self):
+        # host -> number of failures in a row
+        self.failures = {}
+        # host -> time until requests should fail fast
+        self.open_until = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def error_response(message):
+        return {"errors": [{"detail": message}]}
+
+    def get_timeouts(self, url, read_timeout=None):
+        if read_timeout is None:
+            read_timeout = PL_HTTP_READ_TIMEOUT
+            path = urllib.parse.urlsplit(url).path
+            for endpoint, endpoint_timeout in self.ENDPOINT_READ_TIMEOUTS.items():
+                if endpoint in path:
+                    read_timeout = max(read_timeout, endpoint_timeout)
+        return PL_HTTP_CONNECT_TIMEOUT, read_timeout
+
+    def should_retry(self, method, attempt, code, is_network_failure):
+        if attempt >= PL_HTTP_MAX_RETRIES:
+            return False
+        if code in self.RETRY_ALWAYS_CODES:
+            return True
+        if method not in self.IDEMPOTENT_METHODS:
+            return False
+        return is_network_failure or code in self.RETRY_IDEMPOTENT_CODES
+
+    def is_outage(self, code, is_network_failure):
+        # connection errors and timeouts are network failures
+        return is_network_failure or code in self.BREAKER_FAILURE_CODES
+
+    @staticmethod
+    def get_retry_delay(attempt, retry_after=None):
+        if retry_after:
+            delay = None
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                # Retry-After could be provided as a http date
+                retry_at = email.utils.parsedate_tz(retry_after)
+                if retry_at:
+                    delay = email.utils.mktime_tz(retry_at) - time.time()
+            if delay is not None:
+                return min(max(delay, 0), PL_HTTP_RETRY_AFTER_MAX)
+
+        # exponential backoff with the full jitter
+        return random.uniform(0, min(PL_HTTP_BACKOFF_MAX, PL_HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+    def allow_request(self, host):
+        with self.lock:
+            open_until = self.open_until.get(host)
+            if open_until is None:
+                return True
+            if time.time() < open_until:
+                return False
+            # let one request to check the cloud again
+            # while the others keep on failing fast
+            self.open_until[host] = time.time() + PL_HTTP_BREAKER_COOLDOWN
+            return True
+
+    def on_success(self, host):
+        with self.lock:
+            self.failures.pop(host, None)
+            self.open_until.pop(host, None)
+
+    def on_failure(self, host):
+        with self.lock:
+            failures = self.failures.get(host, 0) + 1
+            self.failures[host] = failures
+            if failures >= PL_HTTP_BREAKER_THRESHOLD:
+                log_debug("Cloud " + host + " is unreachable, fail fast for the next " +
+                          str(PL_HTTP_BREAKER_COOLDOWN) + " sec")
+                self.open_until[host] = time.time() + PL_HTTP_BREAKER_COOLDOWN
+
+
+class NetworkStats:
+    """Per-endpoint counters and latency histograms of the impCentral requests"""
+
+    # upper bounds of the latency histogram buckets in ms
+    LATENCY_BUCKETS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+    # path segments which are kept in the endpoint names, all others are ids
+    ENDPOINT_SEGMENTS = ["v5", "auth", "token", "accounts", "me", "capabilities", "products",
+                         "devicegroups", "devices", "deployments", "relationships",
+                         "conditional_restart", "logstream"]
+
+    CACHE_HIT = "cache_hits"
+    CACHE_REVALIDATED = "cache_revalidated"
+    CACHE_MISS = "cache_misses"
+    COALESCED = "coalesced"
+
+    def __init__(self):
+        self.started = datetime.datetime.now()
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_endpoint_name(method, url):
+        segments = urllib.parse.urlsplit(url).path.split("/")
+        return method + " " + "/".join(
+            segment if not segment or segment in NetworkStats.ENDPOINT_SEGMENTS else "{id}"
+            for segment in segments)
+
+    def __get_endpoint(self, method, url):
+        name = self.get_endpoint_name(method, url)
+        endpoint = self.endpoints.get(name)
+        if endpoint is None:
+            endpoint = {
+                "requests": 0,
+                "retries": 0,
+                "bytes_in": 0,
+                "bytes_out": 0,
+                "codes": {},
+                "latency_ms_total": 0,
+                # the last bucket collects everything above the last bound
+                "latency_histogram": [0] * (len(self.LATENCY_BUCKETS) + 1),
+                self.CACHE_HIT: 0,
+                self.CACHE_REVALIDATED: 0,
+                self.CACHE_MISS: 0,
+                self.COALESCED: 0
+            }
+            self.endpoints[name] = endpoint
+        return endpoint
+
+    def record_request(self, method, url, code, elapsed, retries):
+        latency = elapsed * 1000
+        with self.lock:
+            endpoint = self.__get_endpoint(method, url)
+            endpoint["requests"] += 1
+            endpoint["retries"] += retries
+            code = str(code) if code is not None else "failed"
+            endpoint["codes"][code] = endpoint["codes"].get(code, 0) + 1
+            endpoint["latency_ms_total"] += latency
+            endpoint["latency_histogram"][bisect.bisect_left(self.LATENCY_BUCKETS, latency)] += 1
+
+    def record_transfer(self, method, url, bytes_out=0, bytes_in=0):
+        with self.lock:
+            endpoint = self.__get_endpoint(method, url)
+            endpoint["bytes_out"] += bytes_out
+            endpoint["bytes_in"] += bytes_in
+
+    def record_cache(self, url, event):
+        with self.lock:
+            self.__get_endpoint("GET", url)[event] += 1
+
+    @staticmethod
+    def get_percentile(histogram, percentile):
+        # approximates the percentile with linear interpolation inside its bucket
+        total = sum(histogram)
+        if total == 0:
+            return None
+        rank = total * percentile / 100.0
+        count = 0
+        for index, bucket_count in enumerate(histogram):
+            if bucket_count and count + bucket_count >= rank:
+                lower = NetworkStats.LATENCY_BUCKETS[index - 1] if index > 0 else 0
+                if index >= len(NetworkStats.LATENCY_BUCKETS):
+                    return lower
+                upper = NetworkStats.LATENCY_BUCKETS[index]
+                return lower + (upper - lower) * (rank - count) / bucket_count
+            count += bucket_count
+
+    def snapshot(self):
+        with self.lock:
+            endpoints = json.loads(json.dumps(self.endpoints))
+        for name, endpoint in endpoints.items():
+            for percentile in [50, 95, 99]:
+                endpoint["p" + str(percentile) + "_ms"] = \
+                    self.get_percentile(endpoint["latency_histogram"], percentile)
+        return {
+            "started": self.started.strftime('%Y-%m-%d %H:%M:%S'),
+            "latency_buckets_ms": self.LATENCY_BUCKETS,
+            "endpoints": endpoints
+        }
+
+    def reset(self):
+        with self.lock:
+            self.started = datetime.datetime.now()
+            self.endpoints = {}
+
+
 class HTTP:
     """Implementation of all the Electric Imp connection functionality"""
 
@@ -347,41 +1140,194 @@ class HTTP:
 
         return headers
 
+    @staticmethod
+    def pool():
+        global http_connection_pool
+        if not http_connection_pool:
+            http_connection_pool = HttpConnectionPool()
+        return http_connection_pool
+
+    @staticmethod
+    def stats():
+        global network_stats
+        if not network_stats:
+            network_stats = NetworkStats()
+        return network_stats
+
+    @staticmethod
+    def policy():
+        global http_request_policy
+        if not http_request_policy:
+            http_request_policy = HttpRequestPolicy()
+        return http_request_policy
+
+    @staticmethod
+    def prewarm(url):
+        parts = urllib.parse.urlsplit(url)
+        connect_timeout = HTTP.policy().get_timeouts(url)[0]
+        try:
+            HTTP.pool().prewarm(parts.scheme, parts.netloc, connect_timeout)
+        except (OSError, http.client.HTTPException) as error:
+            log_debug("Failed to prewarm the connection to " + parts.netloc + ": " + str(error))
+
+    @staticmethod
+    def is_ui_thread():
+        return ui_thread is not None and threading.current_thread() is ui_thread
+
+    @staticmethod
+    def is_closed_without_response(error):
+        # the server has closed the connection before sending any response byte:
+        # RemoteDisconnected since Python 3.5, BadStatusLine with an empty status line before
+        remote_disconnected = getattr(http.client, "RemoteDisconnected", None)
+        if remote_disconnected and isinstance(error, remote_disconnected):
+            return True
+        return isinstance(error, http.client.BadStatusLine) and error.line in ["", "''"]
+
+    @staticmethod
+    def send_request(url, method, data, headers, connect_timeout=None, read_timeout=None):
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        pool = HTTP.pool()
+        resent = False
+        while True:
+            connection, reused = pool.acquire(parts.scheme, parts.netloc, connect_timeout)
+            if resent and reused:
+                # the request is re-sent over a new connection only
+                connection.close()
+                reused = False
+            sent = False
+            try:
+                if connection.sock is None:
+                    connection.connect()
+                # the connect timeout is replaced with the read one
+                # once the connection is established
+                connection.sock.settimeout(read_timeout)
+                connection.request(method, path, body=data, headers=headers)
+                sent = True
+                HTTP.stats().record_transfer(method, url, bytes_out=len(data) if data else 0)
+                res = connection.getresponse()
+                payload = res.read()
+                HTTP.stats().record_transfer(method, url, bytes_in=len(payload))
+            except (http.client.HTTPException, OSError) as error:
+                connection.close()
+                # the server could drop a keep-alive connection at any time,
+                # re-send the request once over a new connection in that case,
+                # unless a not idempotent request could have been processed already
+                if reused and not resent and not isinstance(error, socket.timeout) and \
+                        (method in HttpRequestPolicy.IDEMPOTENT_METHODS or not sent
+                         or HTTP.is_closed_without_response(error)):
+                    resent = True
+                    continue
+                raise
+
+            if res.will_close:
+                connection.close()
+            else:
+                pool.release(parts.scheme, parts.netloc, connection)
+            return res.status, res.msg, payload
+
     @staticmethod
     def do_request(key, url, method, data=None, timeout=None, headers=None):
+        result, code, response_headers = HTTP.do_request_with_headers(
+            key, url, method, data, timeout, headers)
+        return result, code
+
+    @staticmethod
+    def do_request_with_headers(key, url, method, data=None, timeout=None, headers=None):
         if data:
             data = data.encode('utf-8')
-        req = urllib.request.Request(url,
-                                     headers=HTTP.get_http_headers(key, headers),
-                                     data=data,
-                                     method=method)
+        # copy headers to not modify the shared defaults
+        headers = HTTP.get_http_headers(key, dict(headers) if headers else None)
+
+        policy = HTTP.policy()
+        host = urllib.parse.urlsplit(url).netloc
+        connect_timeout, read_timeout = policy.get_timeouts(url, timeout)
+
+        start = time.time()
+        attempt = 0
+        while True:
+            # fail fast while the cloud is known to be unreachable
+            if not policy.allow_request(host):
+                log_debug("Circuit is open, skip request for URL: " + url)
+                result, code, response_headers = \
+                    HttpRequestPolicy.error_response(STR_FAILED_CLOUD_UNREACHABLE.format(host)), None, {}
+                break
+
+            result, code, response_headers, is_network_failure = HTTP.__send(
+                url, method, data, headers, connect_timeout, read_timeout)
+
+            if policy.is_outage(code, is_network_failure):
+                policy.on_failure(host)
+            else:
+                policy.on_success(host)
+
+            if not policy.should_retry(method, attempt, code, is_network_failure):
+                break
+
+            # the editor must not freeze while waiting for the retry
+            if HTTP.is_ui_thread():
+                log_debug("No retry on the UI thread for URL: " + url)
+                break
+
+            # the next attempt with its timeouts must fit into the remaining retry time
+            delay = policy.get_retry_delay(attempt, response_headers.get("Retry-After"))
+            remaining = PL_HTTP_RETRY_TIME_MAX - (time.time() - start) - delay
+            if remaining < connect_timeout:
+                log_debug("Retry time is over for URL: " + url)
+                break
+            read_timeout = min(read_timeout, remaining)
+            log_debug("Retry request for URL: " + url + " in " + "{:.2f}".format(delay) + " sec")
+            time.sleep(delay)
+            attempt += 1
+
+        HTTP.stats().record_request(method, url, code, time.time() - start, attempt)
+        return result, code, response_headers
 
-        result, code = None, None
+    @staticmethod
+    def __send(url, method, data, headers, connect_timeout, read_timeout):
+        # returns the result, code, response headers
+        # and the flag whether the request failed on the network level
+        result, code, response_headers = None, None, {}
         try:
-            res = urllib.request.urlopen(req, timeout=None)
-            code = res.getcode()
-            pl = res.read().decode('utf-8')
+            code, response_headers, pl = HTTP.send_request(
+                url, method, data, headers, connect_timeout, read_timeout)
+            pl = pl.decode('utf-8')
             if pl:
-                result = json.loads(pl)
+                try:
+                    result = json.loads(pl)
+                except ValueError:
+                    if HTTP.is_response_code_valid(code):
+                        raise
+                    # error pages are not always provided in json
+                    result = {}
+            elif not HTTP.is_response_code_valid(code):
+                result = {}
         except socket.timeout:
             log_debug("Timeout error occurred for URL: " + url)
-            result = code
-        except urllib.error.HTTPError as err:
-            code = err.code
-            result = json.loads(err.read().decode('utf-8'))
-        except urllib.error.URLError as err:
-            code = 404
-            result = {"error": err.reason}
-        except urllib.error.ContentTooShortError:
+            return HttpRequestPolicy.error_response(STR_FAILED_REQUEST_TIMEOUT), None, {}, True
+        except http.client.IncompleteRead:
             code = 404
             result = {"error": STR_FAILED_TOO_SHORT_CONTENT}
+        except (http.client.HTTPException, OSError) as err:
+            return {"error": str(err)}, 404, {}, True
 
-        return result, code
+        return result, code, response_headers, False
 
     @staticmethod
     def get(key, url, timeout=None, data=None, headers=HttpHeaders.DEFAULT_HEADERS):
         return HTTP.do_request(key, url, "GET", timeout=timeout, data=data, headers=headers)
 
+    @staticmethod
+    def conditional_get(key, url, etag=None, headers=HttpHeaders.DEFAULT_HEADERS):
+        headers = dict(headers)
+        if etag:
+            headers["If-None-Match"] = etag
+        result, code, response_headers = HTTP.do_request_with_headers(key, url, "GET", headers=headers)
+        return result, code, response_headers.get("ETag")
+
     @staticmethod
     def post(key, url, data=None, headers=HttpHeaders.DEFAULT_HEADERS):
         return HTTP.do_request(key, url, "POST", data, headers=headers)
@@ -464,10 +1410,66 @@ class ImpRequest():
 
 class ImpCentral:
 
+    PAGE_NUMBER_PATTERN = re.compile(r"(page(?:\[|%5B)number(?:\]|%5D)=)(\d+)", re.IGNORECASE)
+
     def __init__(self, env):
+        self.env = env
         settings = env.project_manager.load_settings()
         self.url = settings.get(EI_CLOUD_URL)
 
+    @staticmethod
+    def response_cache():
+        global http_response_cache
+        if not http_response_cache:
+            http_response_cache = HttpResponseCache()
+        return http_response_cache
+
+    @staticmethod
+    def single_flight():
+        global http_single_flight
+        if not http_single_flight:
+            http_single_flight = SingleFlight()
+        return http_single_flight
+
+    def get_cache_owner(self, token):
+        # the refresh token stays the same while the access token is renewed
+        owner = self.env.project_manager.get_refresh_token() or token or ""
+        return hashlib.sha1(owner.encode("utf-8")).hexdigest()
+
+    def cached_get(self, token, url):
+        # the concurrent identical requests share one http call,
+        # e.g. the device list requested by several windows at once
+        owner = self.get_cache_owner(token)
+        (response, code), is_shared = ImpCentral.single_flight().do(
+            (owner, url), self.__cached_get, token, url, owner)
+        if is_shared:
+            HTTP.stats().record_cache(url, NetworkStats.COALESCED)
+        return response, code
+
+    def __cached_get(self, token, url, owner):
+        cache = ImpCentral.response_cache()
+        cached, etag, is_fresh = cache.get(owner, url)
+        if is_fresh:
+            HTTP.stats().record_cache(url, NetworkStats.CACHE_HIT)
+            return cached, 200
+
+        response, code, new_etag = HTTP.conditional_get(token, url, etag if cached else None)
+        if code == 304 and cached is not None:
+            # not modified, keep on using the cached response
+            HTTP.stats().record_cache(url, NetworkStats.CACHE_REVALIDATED)
+            cache.put(owner, url, cached, etag)
+            return cached, 200
+
+        HTTP.stats().record_cache(url, NetworkStats.CACHE_MISS)
+
+        if code == 200 and response is not None:
+            cache.put(owner, url, response, new_etag)
+        return response, code
+
+    def invalidate_cache(self, *interfaces):
+        for interface in interfaces:
+            ImpCentral.response_cache().invalidate(self.url + interface)
+
     def auth(self, user_name, password):
         url = self.url + "auth"
         response, code = HTTP.post(None, url,
@@ -478,22 +1480,24 @@ class ImpCentral:
         return response, error
 
     def refresh_access_token(self, refresh_token):
-        response, code = HTTP.post(None,
+        # the windows sharing the auth file renew the same token once
+        (response, code), is_shared = ImpCentral.single_flight().do(
+            ("auth/token", refresh_token), HTTP.post, None,
             self.url + "/auth/token",
             '{"token": "' + refresh_token + '"}',
-            headers=HttpHeaders.AUTH_HEADERS)
+            HttpHeaders.AUTH_HEADERS)
         payload, error = self.handle_http_response(response, code)
         return response, error
 
     def account(self, token, owner="me"):
-        response, code = HTTP.get(token,
+        response, code = self.cached_get(token,
             self.url + "/accounts/" + owner)
         payload, error = self.handle_http_response(response, code)
         return payload, error
 
     # Note: it is not documented interface
     def collaborators(self, token):
-        response, code = HTTP.get(token,
+        response, code = self.cached_get(token,
             self.url + "/accounts")
         payload, error = self.handle_http_response(response, code)
         return payload, error
@@ -504,20 +1508,20 @@ class ImpCentral:
         payload, error = self.handle_http_response(response, code)
         return payload, error
 
-    def list_products(self, token, owner_id=None):
+    def list_products(self, token, owner_id=None, fields=None):
         # list all products with owner_id
         filters = {}
         if owner_id is not None:
             filters["owner"] = owner_id
 
         # list all products
-        return self.list_items(token, "products", filters)
+        return self.list_items(token, "products", filters, fields)
 
     def list_device_groups(self, token, product_id):
         filters = {"product": product_id}
         return self.list_items(token, "devicegroups", filters)
 
-    def list_devices(self, token, collaborator, device_group_id=None):
+    def list_devices(self, token, collaborator, device_group_id=None, fields=None):
         filters = {}
         if device_group_id is not None:
             filters["devicegroup"] = device_group_id
@@ -525,51 +1529,105 @@ class ImpCentral:
             # Note: it is not documented interface
             filters["account"] = collaborator
 
-        return self.list_items(token, "devices", filters)
+        return self.list_items(token, "devices", filters, fields)
 
-    def list_items(self, token, interface, filters=None):
+    # fields - the JSON:API sparse fieldsets, maps the resource type
+    #          to the list of its attributes and relationships to request
+    def list_items(self, token, interface, filters=None, fields=None, page_size=PL_LIST_PAGE_SIZE):
         dg_url = self.url + interface
         # filter by group id or not
 
-        filter_query = ""
-        for key in filters:
+        query = []
+        for key in filters or {}:
             if filters[key]:
-                filter_query += 'filter[' + key + '.id]=' + filters[key]
-        if len(filter_query) > 0:
-            dg_url += '?' + filter_query
+                query.append('filter[' + key + '.id]=' + filters[key])
+        for resource_type in fields or {}:
+            query.append('fields[' + resource_type + ']=' + ",".join(fields[resource_type]))
+        if page_size:
+            query.append('page[size]=' + str(page_size))
+        if len(query) > 0:
+            dg_url += '?' + "&".join(query)
 
         log_debug(str(filters))
         items = []
+        response, error = self.read_page(token, dg_url, items)
+        # stop reading devices on http failure
+        if error:
+            return response, error
+
+        # work-around for interface which has wrong 'next' value
+        # for the last pagination page
+        next_link = response["links"].get("next")
+        next_link = None if next_link == dg_url else next_link
+        if next_link is None:
+            return items, None
+
+        # the "last" link allows to request all the remaining pages at once,
+        # otherwise the pages have to be walked one by one
+        page_urls = self.get_page_urls(next_link, response["links"].get("last"))
+        if page_urls:
+            return self.read_pages(token, page_urls, items)
+
+        dg_url = next_link
         while dg_url is not None:
-            # TODO: think about async reading or pagination
-            response, code = HTTP.get(token, url=dg_url)
-            payload, error = self.handle_http_response(response, code)
-
-            log_debug(str(payload) + " " + str(error))
-            # stop reading devices on http failure
+            response, error = self.read_page(token, dg_url, items)
             if error:
                 return response, error
 
-            # check that all devices has correct device group
-            for item in payload:
-                items.append(item)
-
-            # work-around for interface which has wrong 'next' value
-            # for the last pagination page
             next_link = response["links"].get("next")
             dg_url = None if next_link == dg_url else next_link
 
         return items, None
 
+    def read_page(self, token, url, items):
+        response, code = self.cached_get(token, url)
+        payload, error = self.handle_http_response(response, code)
+
+        log_debug(str(payload) + " " + str(error))
+        if not error:
+            items.extend(payload)
+        return response, error
+
+    def read_pages(self, token, page_urls, items):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=PL_HTTP_MAX_PARALLEL_PAGES) as executor:
+            futures = [executor.submit(self.cached_get, token, url) for url in page_urls]
+            # merge pages in the original order
+            for future in futures:
+                response, code = future.result()
+                payload, error = self.handle_http_response(response, code)
+                if error:
+                    # do not wait for the pages which are not requested yet
+                    for pending in futures:
+                        pending.cancel()
+                    return response, error
+                items.extend(payload)
+
+        return items, None
+
+    @staticmethod
+    def get_page_urls(next_link, last_link):
+        if not next_link or not last_link:
+            return None
+
+        next_match = ImpCentral.PAGE_NUMBER_PATTERN.search(next_link)
+        last_match = ImpCentral.PAGE_NUMBER_PATTERN.search(last_link)
+        if not next_match or not last_match:
+            return None
+
+        first_page, last_page = int(next_match.group(2)), int(last_match.group(2))
+        return [ImpCentral.PAGE_NUMBER_PATTERN.sub(
+                    lambda match: match.group(1) + str(page), next_link, count=1)
+                for page in range(first_page, last_page + 1)]
+
     def get_device_group(self, token, device_group_id):
         url = self.url + "devicegroups/" + device_group_id
-        response, code = HTTP.get(token, url=url)
+        response, code = self.cached_get(token, url)
         payload, error = self.handle_http_response(response, code)
         return payload, error
 
     def get_deployment(self, token, deployment_id):
         url = self.url + "deployments/" + deployment_id
-        response, code = HTTP.get(token, url=url)
+        response, code = self.cached_get(token, url)
         payload, error = self.handle_http_response(response, code)
         return payload, error
 
@@ -599,6 +1657,7 @@ class ImpCentral:
             }
         data = json.dumps(payload)
         response, code = HTTP.post(token, url, data, headers=HttpHeaders.DEFAULT_HEADERS)
+        self.invalidate_cache("products")
 
         payload, error = self.handle_http_response(response, code)
 
@@ -622,6 +1681,7 @@ class ImpCentral:
             }})
 
         response, code = HTTP.post(token, url, data)
+        self.invalidate_cache("devicegroups")
         payload, error = self.handle_http_response(response, code)
         return payload, error
 
@@ -641,25 +1701,33 @@ class ImpCentral:
 
 
     def open_log_stream(self, token, log_stream_id):
-        response = None
-        url = self.url + "logstream/" + log_stream_id
+        # returns the stream response and its socket, the socket is kept
+        # to interrupt the reading of the stream from another thread
+        parts = urllib.parse.urlsplit(self.url + "logstream/" + log_stream_id)
         headers = HTTP.get_http_headers(token, HttpHeaders.STREAM_HEADERS)
-        # open socket to start polling
-        request = urllib.request.Request(
-            url=url, headers=headers, method="GET")
+        # a dedicated connection, the stream holds it until the stream is closed;
+        # the stream is considered dropped when even keep-alive messages are not received
+        if parts.scheme == "http":
+            connection = http.client.HTTPConnection(parts.netloc, timeout=PL_KEEP_ALIVE_TIMEOUT)
+        else:
+            connection = http.client.HTTPSConnection(parts.netloc, timeout=PL_KEEP_ALIVE_TIMEOUT)
         try:
-            response = urllib.request.urlopen(request, timeout=None)
-        except socket.timeout:
-            # open url timeout
-            response = None
-        except urllib.error.HTTPError:
-            # - handle expired access token
+            # open socket to start polling
+            connection.request("GET", parts.path, headers=headers)
+            sock = connection.sock
+            response = connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # - open url timeout
             # - no Internet connection
-            response = None
-        if not response:
-            response = None
+            connection.close()
+            return None, None
+        if not HTTP.is_response_code_valid(response.status):
+            # - handle expired access token
+            response.close()
+            connection.close()
+            return None, None
 
-        return response
+        return response, sock
 
     def create_deployment(self, token, device_group_id, agent_code, device_code):
         url = self.url + "deployments"
@@ -676,35 +1744,44 @@ class ImpCentral:
               ' }}')
         # create a new deployment
         response, code = HTTP.post(token, url=url, data=data)
+        # the device group refers to its current deployment
+        self.invalidate_cache("devicegroups/" + device_group_id)
         return self.handle_http_response(response, code)
 
     def assign_device(self, token, device_group_id, device_id):
+        return self.assign_devices(token, device_group_id, [device_id])
+
+    def assign_devices(self, token, device_group_id, device_ids):
         url = self.url + "devicegroups/" + device_group_id + "/relationships/devices"
-        data = json.dumps({
-                "data": [{
-                    "type": "device",
-                    "id": device_id
-                }]
-            })
+        data = self.get_devices_relationship(device_ids)
 
         response, code = HTTP.post(token, url, data)
+        self.invalidate_cache("devices", "devicegroups/" + device_group_id)
         payload, error = self.handle_http_response(response, code)
         return response, error
 
     def unassign_device(self, token, device_group_id, device_id):
+        return self.unassign_devices(token, device_group_id, [device_id])
+
+    def unassign_devices(self, token, device_group_id, device_ids):
         url = self.url + "devicegroups/" + device_group_id + "/relationships/devices"
-        data = json.dumps({
-                "data": [{
-                    "type": "device",
-                    "id": device_id
-                }]
-            })
-        # Append the selected device to the device group
+        data = self.get_devices_relationship(device_ids)
+        # Remove the selected devices from the device group
         response, code = HTTP.delete(token, url, data)
+        self.invalidate_cache("devices", "devicegroups/" + device_group_id)
 
         payload, error = self.handle_http_response(response, code)
         return response, error
 
+    @staticmethod
+    def get_devices_relationship(device_ids):
+        return json.dumps({
+                "data": [{
+                    "type": "device",
+                    "id": device_id
+                } for device_id in device_ids]
+            })
+
     def conditional_restart(self, token, device_group_id):
         url = self.url + "devicegroups/" + device_group_id + "/conditional_restart"
         response, code = HTTP.post(token, url)
@@ -747,17 +1824,412 @@ class ImpCentral:
         return response.get("errors"), {"code": ImpRequest.FAILURE,
             "message": STR_UNHANDLED_HTTP_ERROR.format(str(code))}
 
+
+class ImpCentralAsync:
+    """ImpCentral requests running on the background threads shared by all the windows
+
+    Every ImpCentral method is available with the same arguments,
+    but returns a future of the original result instead of the result itself.
+    """
+
+    def __init__(self, env):
+        self.central = ImpCentral(env)
+
+    @staticmethod
+    def executor():
+        global imp_central_executor
+        if not imp_central_executor:
+            imp_central_executor = concurrent.futures.ThreadPoolExecutor(max_workers=PL_HTTP_MAX_WORKERS)
+        return imp_central_executor
+
+    def __getattr__(self, name):
+        method = getattr(self.central, name)
+        if not callable(method):
+            return method
+
+        def submit(*args, **kwargs):
+            return ImpCentralAsync.executor().submit(method, *args, **kwargs)
+        return submit
+
+    @staticmethod
+    def on_complete(future, callback):
+        # the callback is called on the Sublime's async thread
+        # with the unpacked result of the request,
+        # an unexpected exception is reported as the request failure
+        def on_done(done):
+            try:
+                result = done.result()
+            except Exception as exc:
+                log_debug("ImpCentral request failed: {}".format(exc))
+                result = (None, {"code": ImpRequest.FAILURE, "message": str(exc)})
+            sublime.set_timeout_async(lambda: callback(*result), 0)
+        future.add_done_callback(on_done)
+
+
 class SourceType():
 
     AGENT = 0
     DEVICE = 1
 
 
+class BuilderWorker:
+    """Long-lived Node.js process which preprocesses the code with the Builder module loaded once"""
+
+    SHIM_FILE_NAME = "builder_worker.js"
+
+    def __init__(self, node_path, builder_cli_path):
+        self.node_path = node_path
+        self.builder_cli_path = builder_cli_path
+        self.process = None
+        self.responses = None
+        self.request_id = 0
+        # do not try to start the worker again until this time
+        self.retry_at = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get(node_path, builder_cli_path, slot):
+        # the agent and the device code are preprocessed concurrently by separate workers
+        global builder_workers
+        key = (node_path, builder_cli_path, slot)
+        if key not in builder_workers:
+            builder_workers[key] = BuilderWorker(node_path, builder_cli_path)
+        return builder_workers[key]
+
+    @staticmethod
+    def stop_all():
+        global builder_workers
+        for worker in list(builder_workers.values()):
+            worker.stop()
+        builder_workers = {}
+
+    @staticmethod
+    def get_shim_path():
+        plugin_dir = os.path.dirname(os.path.realpath(__file__))
+        shim_path = os.path.join(plugin_dir, "plugin_resources", BuilderWorker.SHIM_FILE_NAME)
+        if os.path.exists(shim_path):
+            return shim_path
+
+        # node can't run the shim from the .sublime-package archive, extract it first
+        plugin_name, ext = os.path.splitext(os.path.basename(plugin_dir))
+        content = sublime.load_resource(
+            "/".join(["Packages", plugin_name, "plugin_resources", BuilderWorker.SHIM_FILE_NAME]))
+        shim_dir = os.path.join(sublime.cache_path(), plugin_name)
+        if not os.path.exists(shim_dir):
+            os.makedirs(shim_dir)
+        shim_path = os.path.join(shim_dir, BuilderWorker.SHIM_FILE_NAME)
+        with open(shim_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return shim_path
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        # cli.js is located in the src folder of the Builder module
+        builder_dir = os.path.dirname(os.path.dirname(self.builder_cli_path))
+        try:
+            self.process = subprocess.Popen([self.node_path, self.get_shim_path(), builder_dir],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError as error:
+            log_debug("Failed to start the Builder worker: " + str(error))
+            self.process = None
+            return False
+
+        self.responses = queue.Queue()
+        threading.Thread(target=self.__read_responses, args=(self.process, self.responses), daemon=True).start()
+
+        # health check: the Builder module is loaded and the worker responds
+        if self.__call({"ping": True}, PL_BUILDER_WORKER_START_TIMEOUT) is None:
+            log_debug("The Builder worker is not responding")
+            self.stop()
+            return False
+        log_debug("The Builder worker is started: " + builder_dir)
+        return True
+
+    def stop(self):
+        if self.process:
+            try:
+                self.process.kill()
+            except OSError:
+                pass
+            self.process = None
+
+    @staticmethod
+    def __read_responses(process, responses):
+        for line in process.stdout:
+            try:
+                responses.put(json.loads(line.decode("utf-8")))
+            except ValueError:
+                log_debug("Unexpected Builder worker output: " + str(line))
+        # the worker has exited
+        responses.put(None)
+
+    def __call(self, request, timeout):
+        self.request_id += 1
+        request["id"] = self.request_id
+        try:
+            self.process.stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+            self.process.stdin.flush()
+            while True:
+                response = self.responses.get(timeout=timeout)
+                if response is None or "fatal" in response:
+                    log_debug("Builder worker failure: " + str(response))
+                    return None
+                # skip the responses to the timed out requests
+                if response.get("id") == request["id"]:
+                    return response
+        except (OSError, queue.Empty):
+            return None
+
+    def preprocess(self, source_filename, variable_defines, github_user, github_token):
+        # returns the same results as the Builder process or None if the worker is not available
+        request = {
+            "file": source_filename.replace("\\", "/"),
+            "lineControl": True,
+            "defines": variable_defines or {},
+            "github": {"user": github_user, "token": github_token}
+        }
+        with self.lock:
+            if not self.is_alive():
+                if time.time() < self.retry_at:
+                    return None
+                if not self.start():
+                    self.retry_at = time.time() + PL_BUILDER_WORKER_RETRY
+                    return None
+
+            response = self.__call(request, PL_BUILDER_WORKER_TIMEOUT)
+            if response is None:
+                # the worker has crashed or hung, it is restarted on the next build
+                self.stop()
+                return None
+
+        errors = response.get("errors") or ""
+        return (1 if errors else 0), (response.get("output") or "").encode("utf-8"), errors.encode("utf-8")
+
+
+class BuildCache:
+    """Inputs of the last Builder runs kept in the project build directory"""
+
+    INCLUDE_PATTERN = re.compile(r"^\s*@include\s+(?:once\s+)?(.*?)\s*$", re.MULTILINE)
+    # includes like github:, https:, git-local: and so on
+    REMOTE_INCLUDE_PATTERN = re.compile(r"^[\w-]{2,}:")
+
+    def __init__(self, build_dir):
+        self.filename = os.path.join(build_dir, PR_BUILD_CACHE_FILE)
+        self.entries = {}
+        if os.path.exists(self.filename):
+            try:
+                with open(self.filename, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                log_debug("Broken build cache is ignored: " + self.filename)
+
+    @staticmethod
+    def get_signature(filename):
+        try:
+            stat = os.stat(filename)
+            return [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            return None
+
+    @staticmethod
+    def get_builder_version(builder_cli_path):
+        # cli.js is located in the src folder of the Builder module
+        package_filename = os.path.join(os.path.dirname(os.path.dirname(builder_cli_path)), "package.json")
+        try:
+            with open(package_filename, encoding="utf-8") as f:
+                return json.load(f).get("version")
+        except (OSError, ValueError):
+            return BuildCache.get_signature(builder_cli_path)
+
+    def get_local_includes(self, source_filename):
+        # returns the signatures of all the local files which could be included,
+        # or None if the code includes remote or computed files that can't be checked
+        includes = {}
+        pending = [source_filename]
+        while pending:
+            filename = pending.pop()
+            try:
+                with open(filename, encoding="utf-8") as f:
+                    code = f.read()
+            except (OSError, UnicodeDecodeError):
+                continue
+
+            for match in self.INCLUDE_PATTERN.finditer(code):
+                literal = match.group(1)
+                if len(literal) < 2 or literal[0] not in "\"'" or literal[-1] != literal[0]:
+                    return None
+                include = literal[1:-1]
+                if "${" in include or "@{" in include or self.REMOTE_INCLUDE_PATTERN.match(include):
+                    return None
+
+                include = os.path.normpath(os.path.join(os.path.dirname(filename), include))
+                if include not in includes:
+                    includes[include] = self.get_signature(include)
+                    if includes[include]:
+                        pending.append(include)
+        return includes
+
+    def get_inputs(self, source_filename, variable_defines, builder_version):
+        includes = self.get_local_includes(source_filename)
+        if includes is None:
+            return None
+        try:
+            with open(source_filename, "rb") as f:
+                source_hash = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+        return {
+            "source": source_hash,
+            "includes": includes,
+            "defines": variable_defines or {},
+            "builder": builder_version
+        }
+
+    def is_up_to_date(self, result_filename, inputs):
+        entry = self.entries.get(result_filename)
+        return (inputs is not None and entry is not None
+                and entry.get("inputs") == inputs
+                and entry.get("output") == self.get_signature(result_filename))
+
+    def update(self, result_filename, inputs):
+        if inputs is None:
+            self.entries.pop(result_filename, None)
+        else:
+            self.entries[result_filename] = {"inputs": inputs, "output": self.get_signature(result_filename)}
+
+    def save(self):
+        ProjectManager.dump_map_to_json_file(self.filename, self.entries)
+
+
+class LineTable:
+    """Maps the preprocessed code lines to the original files and lines
+
+    Only the line anchors are stored: the preprocessed line where every
+    original code fragment starts, its original line and file index.
+    The lines between the anchors are resolved with a binary search.
+
+    The table is saved as a binary source map: the header, the anchor
+    arrays of 32-bit integers and the zero separated file names.
+    A loaded source map is used through mmap without being parsed."""
+
+    MAGIC = b"EISM"
+    VERSION = 1
+    # magic, version, reserved, build hash, line count, anchor count, file names size
+    HEADER = struct.Struct("<4sHH32sIII")
+
+    def __init__(self, orig_file):
+        self.file_names = []
+        self.file_indexes = {}
+        self.lines = array.array("l")
+        self.orig_lines = array.array("l")
+        self.files = array.array("l")
+        self.line_count = 0
+        self.build_hash = None
+        self.source_map = None
+        self.source_map_path = None
+        self.add_anchor(0, orig_file, 0)
+
+    def __len__(self):
+        # the location right after the last line is valid too, like in the Builder output
+        return self.line_count + 1
+
+    def add_anchor(self, line, orig_file, orig_line):
+        file_index = self.file_indexes.get(orig_file)
+        if file_index is None:
+            file_index = len(self.file_names)
+            self.file_indexes[orig_file] = file_index
+            self.file_names.append(orig_file)
+        self.lines.append(line)
+        self.orig_lines.append(orig_line)
+        self.files.append(file_index)
+
+    def get_location(self, line):
+        if not 0 <= line <= self.line_count:
+            raise KeyError(line)
+        anchor = bisect.bisect_right(self.lines, line) - 1
+        return self.file_names[self.files[anchor]], self.orig_lines[anchor] + line - self.lines[anchor]
+
+    def save(self, filename):
+        file_names = "\0".join(self.file_names).encode("utf-8")
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, 0, self.build_hash or bytes(32),
+                                  self.line_count, len(self.lines), len(file_names))
+        temp_filename = filename + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp"
+        try:
+            with open(temp_filename, "wb") as f:
+                f.write(header)
+                for values in (self.lines, self.orig_lines, self.files):
+                    anchors = array.array("i", values)
+                    if sys.byteorder != "little":
+                        anchors.byteswap()
+                    f.write(anchors.tobytes())
+                f.write(file_names)
+            os.replace(temp_filename, filename)
+        except OSError as error:
+            log_debug("Failed to save the source map " + filename + ": " + str(error))
+        finally:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+
+    @staticmethod
+    def load(filename):
+        # the anchors are used right from the mapped file, the byte order is native
+        if sys.byteorder != "little" or array.array("i").itemsize != 4:
+            return None
+        try:
+            with open(filename, "rb") as f:
+                source_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        size = LineTable.HEADER.size
+        if len(source_map) >= size:
+            magic, version, reserved, build_hash, line_count, anchor_count, names_size = \
+                LineTable.HEADER.unpack_from(source_map)
+            if magic == LineTable.MAGIC and version == LineTable.VERSION and \
+                    anchor_count > 0 and len(source_map) == size + 12 * anchor_count + names_size:
+                line_table = LineTable.__new__(LineTable)
+                line_table.source_map = source_map
+                line_table.source_map_path = filename
+                view = memoryview(source_map)
+                line_table.lines, line_table.orig_lines, line_table.files = \
+                    [view[offset:offset + 4 * anchor_count].cast("i")
+                     for offset in range(size, size + 12 * anchor_count, 4 * anchor_count)]
+                view.release()
+                line_table.file_names = bytes(source_map[size + 12 * anchor_count:]).decode("utf-8").split("\0")
+                line_table.file_indexes = None
+                line_table.line_count = line_count
+                line_table.build_hash = build_hash
+                return line_table
+
+        log_debug("Broken source map is ignored: " + filename)
+        source_map.close()
+        return None
+
+    def close(self):
+        # releases the mapped file, so it could be replaced
+        if self.source_map is not None:
+            try:
+                for view in (self.lines, self.orig_lines, self.files):
+                    view.release()
+                self.source_map.close()
+            except BufferError:
+                pass  # still in use, the file is released when the table is collected
+
+
 class Preprocessor:
     """Preprocessor and Builder specific implementation"""
 
+    LINE_ANCHOR_PATTERN = re.compile(r".*//line (\d+) \"(.+)\"")
+    # the file names of the code which does not start with a line anchor
+    ORIGINAL_FILE_NAMES = {SourceType.AGENT: PR_AGENT_FILE_NAME, SourceType.DEVICE: PR_DEVICE_FILE_NAME}
+
     def __init__(self):
         self.line_table = {SourceType.AGENT: None, SourceType.DEVICE: None}
+        # the line tables of the previous deployments by the deployment id and source type
+        self.deployment_line_tables = {}
+        self.deployments_index = (None, [])
 
     def preprocess(self, env):
 
@@ -773,77 +2245,142 @@ class Preprocessor:
         if not os.path.exists(dest_dir):
             os.makedirs(dest_dir)
 
-        for code_files in [[
-            source_agent_filename,
-            result_agent_filename
-        ], [
-            source_device_filename,
-            result_device_filename
-        ]]:
-            try:
-                args = [
-                    settings[EI_BUILDER_SETTINGS][EI_ST_PR_NODE_PATH],
-                    settings[EI_BUILDER_SETTINGS][EI_ST_PR_BUILDER_CLI],
-                    "-l",
-                    code_files[0].replace("\\", "/")
-                ]
-
-                github_user, github_token = env.project_manager.get_github_auth_info()
-                if github_user and github_token:
-                    args.append("--github-user")
-                    args.append(github_user)
-                    args.append("--github-token")
-                    args.append(github_token)
-
-                settings = env.project_manager.load_settings()
-                builder_settings = settings[EI_BUILDER_SETTINGS]
-
-                variable_defines = builder_settings[EI_VARIABLE_DEFINES] \
-                    if builder_settings and EI_VARIABLE_DEFINES in builder_settings else None
-
-                if variable_defines:
-                    for key in variable_defines:
-                        args.append("-D" + key)
-                        args.append(variable_defines[key])
-
-                pipes = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                prep_out, prep_err = pipes.communicate()
-
-                def strip_off_color_control_chars(str):
-                    return str.replace("\x1B[31m", "").replace("\x1B[39m", "")
-
-                if pipes.returncode != 0 or len(prep_err):
-                    reported_error = strip_off_color_control_chars(prep_err.strip().decode("utf-8"))
-                    env.ui_manager.write_to_console(STR_ERR_PREPROCESSING_ERROR.format(reported_error))
-                    # Return on error
-                    return None, None
-
-                # Write the binary content to the file
-                with open(code_files[1], "wb") as output:
-                    output.write(prep_out)
-
-                def substitute_string_in_file(filename, old_string, new_string):
-                    with open(filename, encoding="utf-8") as f:
-                        s = f.read()
-                        if old_string not in s:
-                            return
-                    with open(filename, 'w', encoding="utf-8") as f:
-                        s = s.replace(old_string, new_string)
-                        f.write(s)
+        code_files = {
+            SourceType.AGENT: [source_agent_filename, result_agent_filename],
+            SourceType.DEVICE: [source_device_filename, result_device_filename]
+        }
 
-                # Change line number anchors format
-                substitute_string_in_file(code_files[1], "#line", "//line")
+        # skip the targets which sources, includes and defines are not changed since the last build
+        build_cache = BuildCache(dest_dir)
+        builder_version = BuildCache.get_builder_version(settings[EI_BUILDER_SETTINGS][EI_ST_PR_BUILDER_CLI])
+        inputs = {}
+        source_types = []
+        for source_type, files in sorted(code_files.items()):
+            inputs[source_type] = build_cache.get_inputs(
+                files[0], self.get_variable_defines(settings), builder_version)
+            if build_cache.is_up_to_date(files[1], inputs[source_type]):
+                env.ui_manager.write_to_console(STR_BUILD_CACHE_HIT.format(os.path.basename(files[0])))
+            else:
+                env.ui_manager.write_to_console(STR_BUILD_CACHE_MISS.format(os.path.basename(files[0])))
+                source_types.append(source_type)
+
+        if not source_types:
+            self.__update_line_table(env, source_types)
+            return result_agent_filename, result_device_filename
+
+        code_files = [code_files[source_type] for source_type in source_types]
+
+        # the Builder processes are independent,
+        # run them for the agent and the device code at the same time
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(code_files)) as executor:
+            futures = [executor.submit(self.build, env, settings, files[0], slot)
+                       for slot, files in zip(source_types, code_files)]
+            results = [future.result() for future in futures]
+
+        def strip_off_color_control_chars(str):
+            return str.replace("\x1B[31m", "").replace("\x1B[39m", "")
+
+        # report the errors of both targets
+        failed = False
+        for files, (returncode, prep_out, prep_err) in zip(code_files, results):
+            if returncode != 0 or len(prep_err):
+                reported_error = strip_off_color_control_chars(prep_err.strip().decode("utf-8"))
+                env.ui_manager.write_to_console(
+                    STR_ERR_PREPROCESSING_ERROR.format(os.path.basename(files[0]), reported_error))
+                failed = True
+
+        if failed:
+            # Return on error
+            return None, None
+
+        for source_type, files, (returncode, prep_out, prep_err) in zip(source_types, code_files, results):
+            if self.line_table[source_type]:
+                self.line_table[source_type].close()
+            self.line_table[source_type] = self.write_preprocessed_code(files[1], prep_out, source_type)
+            self.line_table[source_type].save(files[1] + PR_SOURCE_MAP_SUFFIX)
+            build_cache.update(files[1], inputs[source_type])
+
+        build_cache.save()
+        self.__update_line_table(env, source_types)
+        return result_agent_filename, result_device_filename
 
-            except subprocess.CalledProcessError as error:
-                log_debug("Error running preprocessor. The process returned code: " + str(error.returncode))
+    def write_preprocessed_code(self, filename, prep_out, source_type):
+        # a single pass over the Builder output changes the line number anchors format,
+        # writes the preprocessed file and builds its line table
+        def rewrite_lines(output):
+            for line in io.StringIO(prep_out.decode("utf-8"), newline=None):
+                line = line.replace("#line", "//line")
+                output.write(line)
+                yield line
 
-        self.__build_line_table(env)
-        return result_agent_filename, result_device_filename
+        with open(filename, "w", encoding="utf-8") as output:
+            return self.get_line_table(rewrite_lines(output), self.ORIGINAL_FILE_NAMES[source_type])
+
+    @staticmethod
+    def get_builder_args(env, settings, source_filename):
+        args = [
+            settings[EI_BUILDER_SETTINGS][EI_ST_PR_NODE_PATH],
+            settings[EI_BUILDER_SETTINGS][EI_ST_PR_BUILDER_CLI],
+            "-l",
+            source_filename.replace("\\", "/")
+        ]
+
+        github_user, github_token = env.project_manager.get_github_auth_info()
+        if github_user and github_token:
+            args.append("--github-user")
+            args.append(github_user)
+            args.append("--github-token")
+            args.append(github_token)
+
+        variable_defines = Preprocessor.get_variable_defines(settings)
+        if variable_defines:
+            for key in variable_defines:
+                args.append("-D" + key)
+                args.append(variable_defines[key])
+
+        return args
+
+    @staticmethod
+    def get_variable_defines(settings):
+        builder_settings = settings[EI_BUILDER_SETTINGS]
+        return builder_settings[EI_VARIABLE_DEFINES] \
+            if builder_settings and EI_VARIABLE_DEFINES in builder_settings else None
+
+    def build(self, env, settings, source_filename, slot):
+        global plugin_settings
+        if not plugin_settings or plugin_settings.get(PL_BUILDER_WORKER_FLAG, True):
+            worker = BuilderWorker.get(settings[EI_BUILDER_SETTINGS][EI_ST_PR_NODE_PATH],
+                                       settings[EI_BUILDER_SETTINGS][EI_ST_PR_BUILDER_CLI], slot)
+            github_user, github_token = env.project_manager.get_github_auth_info()
+            result = worker.preprocess(source_filename, self.get_variable_defines(settings),
+                                       github_user, github_token)
+            if result is not None:
+                return result
+            log_debug("The Builder worker is not available, running the Builder process")
+
+        return self.run_builder(self.get_builder_args(env, settings, source_filename))
 
-    def __build_line_table(self, env):
-        for source_type in self.line_table:
+    @staticmethod
+    def run_builder(args):
+        # returns the exit code, the output and the errors output of the Builder
+        try:
+            pipes = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            prep_out, prep_err = pipes.communicate()
+            return pipes.returncode, prep_out, prep_err
+        except OSError as error:
+            log_debug("Error running preprocessor: " + str(error))
+            return -1, b"", str(error).encode("utf-8")
+
+    def __build_line_table(self, env, source_types=None):
+        for source_type in self.line_table if source_types is None else source_types:
             self.line_table[source_type] = self.__build_line_table_for(source_type, env)
 
+    def __update_line_table(self, env, rebuilt_source_types):
+        # the line tables of the rebuilt targets are built with the output,
+        # the cached targets tables are still valid unless the plug-in was reloaded
+        self.__build_line_table(env, [source_type for source_type in self.line_table
+            if source_type not in rebuilt_source_types and not self.line_table[source_type]])
+
     def __build_line_table_for(self, source_type, env):
         # Setup the preprocessed file name based on the source type
         bld_dir = env.project_manager.get_build_directory_path()
@@ -857,33 +2394,116 @@ class Preprocessor:
             log_debug("Wrong source type")
             return
 
-        # Parse the target file and build the code line table
-        line_table = {}
-        pattern = re.compile(r".*//line (\d+) \"(.+)\"")
-        curr_line = 0
-        orig_line = 0
+        # Load the source map saved with the target file or parse the file and build the code line table
+        line_table = None
         if os.path.exists(preprocessed_file_path):
-            with open(preprocessed_file_path, 'r', encoding="utf-8") as f:
-                while 1:
-                    line_table[str(curr_line)] = (orig_file, orig_line)
-                    line = f.readline()
-                    if not line:
-                        break
-                    match = pattern.match(line)
-                    if match:
-                        orig_line = int(match.group(1)) - 1
-                        orig_file = match.group(2)
-                    orig_line += 1
-                    curr_line += 1
+            source_map_path = preprocessed_file_path + PR_SOURCE_MAP_SUFFIX
+            code_signature = BuildCache.get_signature(preprocessed_file_path)
+            source_map_signature = BuildCache.get_signature(source_map_path)
+            if source_map_signature and source_map_signature[0] >= code_signature[0]:
+                line_table = LineTable.load(source_map_path)
+            if line_table is None:
+                with open(preprocessed_file_path, 'r', encoding="utf-8") as f:
+                    line_table = self.get_line_table(f, orig_file)
+                line_table.save(source_map_path)
+
+        return line_table
+
+    @staticmethod
+    def get_line_table(lines, orig_file):
+        # the original code continues on the line right after an anchor
+        line_table = LineTable(orig_file)
+        build_hash = hashlib.sha256()
+        curr_line = 0
+        for line in lines:
+            curr_line += 1
+            build_hash.update(line.encode("utf-8"))
+            if "//line" in line:
+                match = Preprocessor.LINE_ANCHOR_PATTERN.match(line)
+                if match:
+                    line_table.add_anchor(curr_line, match.group(2), int(match.group(1)))
+        line_table.line_count = curr_line
+        line_table.build_hash = build_hash.digest()
 
         return line_table
 
     # Converts error location in the preprocessed code into the original filename and line number
-    def get_error_location(self, source_type, line, env):
-        if not self.line_table[source_type]:
-            self.__build_line_table(env)
-        code_table = self.line_table[source_type]
-        return None if code_table is None else code_table[str(line)]
+    def get_error_location(self, source_type, line, env, deployment_id=None):
+        code_table = self.get_deployment_line_table(env, deployment_id, source_type) if deployment_id else None
+        if code_table is None:
+            if not self.line_table[source_type]:
+                self.__build_line_table(env)
+            code_table = self.line_table[source_type]
+        return None if code_table is None else code_table.get_location(line)
+
+    @staticmethod
+    def get_source_maps_directory(env):
+        return os.path.join(env.project_manager.get_build_directory_path(), PR_SOURCE_MAPS_DIRECTORY)
+
+    def load_deployments_index(self, env):
+        # the list of [deployment id, agent build hash, device build hash] from the oldest deployment
+        filename = os.path.join(self.get_source_maps_directory(env), PR_SOURCE_MAPS_INDEX)
+        signature = BuildCache.get_signature(filename)
+        if signature != self.deployments_index[0]:
+            deployments = []
+            if signature:
+                try:
+                    with open(filename, encoding="utf-8") as f:
+                        deployments = json.load(f)
+                except (OSError, ValueError):
+                    log_debug("Broken source maps index is ignored: " + filename)
+            self.deployments_index = (signature, deployments)
+        return self.deployments_index[1]
+
+    def save_deployment_source_maps(self, env, deployment_id):
+        # keeps the source maps of the deployed code for translating its logs later
+        source_maps_dir = self.get_source_maps_directory(env)
+        build_hashes = []
+        for source_type in [SourceType.AGENT, SourceType.DEVICE]:
+            if not self.line_table[source_type]:
+                self.__build_line_table(env, [source_type])
+            line_table = self.line_table[source_type]
+            if line_table is None or not line_table.build_hash:
+                return
+            build_hashes.append(binascii.hexlify(line_table.build_hash).decode("ascii"))
+            source_map_path = os.path.join(source_maps_dir, build_hashes[-1] + PR_SOURCE_MAP_SUFFIX)
+            if not os.path.exists(source_map_path):
+                if not os.path.exists(source_maps_dir):
+                    os.makedirs(source_maps_dir)
+                line_table.save(source_map_path)
+
+        deployments = [deployment for deployment in self.load_deployments_index(env)
+                       if deployment[0] != deployment_id]
+        deployments = (deployments + [[deployment_id] + build_hashes])[-PL_SOURCE_MAPS_KEPT:]
+        ProjectManager.dump_map_to_json_file(os.path.join(source_maps_dir, PR_SOURCE_MAPS_INDEX), deployments)
+
+        # remove the source maps which are not used by the kept deployments
+        kept = set(build_hash + PR_SOURCE_MAP_SUFFIX for deployment in deployments for build_hash in deployment[1:])
+        for filename in os.listdir(source_maps_dir):
+            if filename.endswith(PR_SOURCE_MAP_SUFFIX) and filename not in kept:
+                for key in [key for key, line_table in self.deployment_line_tables.items()
+                            if line_table.source_map_path == os.path.join(source_maps_dir, filename)]:
+                    self.deployment_line_tables.pop(key).close()
+                try:
+                    os.remove(os.path.join(source_maps_dir, filename))
+                except OSError:
+                    pass  # the next deployment will try again
+
+    def get_deployment_line_table(self, env, deployment_id, source_type):
+        key = (deployment_id, source_type)
+        if key not in self.deployment_line_tables:
+            for deployment in self.load_deployments_index(env):
+                if deployment[0] == deployment_id:
+                    source_map_path = os.path.join(self.get_source_maps_directory(env),
+                                                   deployment[1 + source_type] + PR_SOURCE_MAP_SUFFIX)
+                    line_table = LineTable.load(source_map_path)
+                    if line_table is None:
+                        return None
+                    self.deployment_line_tables[key] = line_table
+                    break
+            else:
+                return None
+        return self.deployment_line_tables[key]
 
 
 class BaseElectricImpCommand(sublime_plugin.WindowCommand):
@@ -898,32 +2518,31 @@ class BaseElectricImpCommand(sublime_plugin.WindowCommand):
             self.env = Env.get_existing_or_create_env_for(self.window)
 
         # Try to locate node and node modules
-        settings = self.load_settings()
-        if EI_BUILDER_SETTINGS not in settings:
-            settings[EI_BUILDER_SETTINGS] = {
-                EI_VARIABLE_DEFINES: {}
-            }
-        builder_settings = settings[EI_BUILDER_SETTINGS]
-
-        settings_updated = False
-
         node_locator = NodeLocator(sublime.platform())
         node_path = node_locator.get_node_path()
-        if (EI_ST_PR_NODE_PATH not in builder_settings
-            or node_path != builder_settings[EI_ST_PR_NODE_PATH]) \
-                and os.path.exists(node_path):
-            settings_updated = True
-            builder_settings[EI_ST_PR_NODE_PATH] = node_path
-
         builder_cli_path = node_locator.get_builder_cli_path()
-        if (EI_ST_PR_BUILDER_CLI not in builder_settings
-            or builder_cli_path != builder_settings[EI_ST_PR_BUILDER_CLI]) \
-                and os.path.exists(builder_cli_path):
-            settings_updated = True
-            builder_settings[EI_ST_PR_BUILDER_CLI] = builder_cli_path
 
-        if settings_updated:
-            self.env.project_manager.save_settings(PR_SETTINGS_FILE, settings)
+        # the settings are read and updated at once, not to overwrite
+        # the deployment updates of the async threads
+        with self.settings_transaction() as transaction:
+            builder_settings = transaction.get(EI_BUILDER_SETTINGS) or {EI_VARIABLE_DEFINES: {}}
+
+            settings_updated = False
+
+            if (EI_ST_PR_NODE_PATH not in builder_settings
+                or node_path != builder_settings[EI_ST_PR_NODE_PATH]) \
+                    and os.path.exists(node_path):
+                settings_updated = True
+                builder_settings[EI_ST_PR_NODE_PATH] = node_path
+
+            if (EI_ST_PR_BUILDER_CLI not in builder_settings
+                or builder_cli_path != builder_settings[EI_ST_PR_BUILDER_CLI]) \
+                    and os.path.exists(builder_cli_path):
+                settings_updated = True
+                builder_settings[EI_ST_PR_BUILDER_CLI] = builder_cli_path
+
+            if settings_updated:
+                transaction.set(EI_BUILDER_SETTINGS, builder_settings)
 
     def load_settings(self):
         return self.env.project_manager.load_settings()
@@ -973,24 +2592,19 @@ class BaseElectricImpCommand(sublime_plugin.WindowCommand):
         self.action()
         self.show_action_status()
 
+    def settings_transaction(self):
+        return self.env.project_manager.settings_transaction(PR_SETTINGS_FILE)
+
+    def auth_settings_transaction(self):
+        return self.env.project_manager.settings_transaction(PR_AUTH_INFO_FILE)
+
     def update_settings(self, index, value):
-        settings = self.load_settings()
-        # remove element from the configuration
-        if value is None and index in settings:
-            del settings[index]
-        else:
-            settings[index] = value
-        self.env.project_manager.save_settings(PR_SETTINGS_FILE, settings)
+        with self.settings_transaction() as settings:
+            settings.set(index, value)
 
     def update_auth_settings(self, index, value):
-        settings = self.load_auth_settings()
-        # remove element from the configuration
-        if value is None and index in settings:
-            del settings[index]
-        else:
-            settings[index] = value
-        # save an update settings
-        self.env.project_manager.save_settings(PR_AUTH_INFO_FILE, settings)
+        with self.auth_settings_transaction() as settings:
+            settings.set(index, value)
 
     def print_to_tty(self, text):
         env = Env.For(self.window)
@@ -1103,19 +2717,12 @@ class ImpCheckOldVersionCommand(BaseElectricImpCommand):
             self.on_action_complete(canceled=True)
             return
 
-        auth_info = self.load_auth_settings()
-        if EI_BUILD_API_KEY in auth_info:
-            self.update_auth_settings(EI_BUILD_API_KEY, None)
-
-        settings = self.load_settings()
-        if (EI_MODEL_NAME in settings):
-            self.update_settings(EI_MODEL_NAME, None)
+        self.update_auth_settings(EI_BUILD_API_KEY, None)
 
-        if (EI_MODEL_ID in settings):
-            self.update_settings(EI_MODEL_ID, None)
-
-        if (EI_DEVICE_ID in settings):
-            self.update_settings(EI_DEVICE_ID, None)
+        with self.settings_transaction() as settings:
+            settings.set(EI_MODEL_NAME, None)
+            settings.set(EI_MODEL_ID, None)
+            settings.set(EI_DEVICE_ID, None)
 
         # continue
         self.on_action_complete();
@@ -1143,12 +2750,9 @@ class ImpCheckNodejsPathCommand(BaseElectricImpCommand):
         log_debug("Node.js path provided: " + path)
         if os.path.exists(path):
             log_debug("Node.js path is valid")
-            settings = self.load_settings()
-            if EI_BUILDER_SETTINGS not in settings:
-                settings[EI_BUILDER_SETTINGS] = {}
-            builder_settings = settings[EI_BUILDER_SETTINGS]
-            builder_settings[EI_ST_PR_NODE_PATH] = path
-            self.env.project_manager.save_settings(PR_SETTINGS_FILE, settings)
+            with self.settings_transaction() as transaction:
+                builder_settings = transaction.settings.setdefault(EI_BUILDER_SETTINGS, {})
+                builder_settings[EI_ST_PR_NODE_PATH] = path
         else:
             if sublime.ok_cancel_dialog(STR_INVALID_NODE_JS_PATH):
                 self.action(skip_dialog=True)
@@ -1180,12 +2784,9 @@ class ImpCheckBuilderPathCommand(BaseElectricImpCommand):
         log_debug("Builder CLI path provided: " + path)
         if os.path.exists(path):
             log_debug("Builder CLI path is valid")
-            settings = self.load_settings()
-            if EI_BUILDER_SETTINGS not in settings:
-                settings[EI_BUILDER_SETTINGS] = {}
-            builder_settings = settings[EI_BUILDER_SETTINGS]
-            builder_settings[EI_ST_PR_BUILDER_CLI] = path
-            self.env.project_manager.save_settings(PR_SETTINGS_FILE, settings)
+            with self.settings_transaction() as transaction:
+                builder_settings = transaction.settings.setdefault(EI_BUILDER_SETTINGS, {})
+                builder_settings[EI_ST_PR_BUILDER_CLI] = path
         else:
             if sublime.ok_cancel_dialog(STR_INVALID_BUILDER_CLI_PATH):
                 self.prompt_for_node_js_path(False)
@@ -1297,19 +2898,20 @@ class ImpAuthCommand(BaseElectricImpCommand):
         log_debug("Access token received")
         # make mapping values from the impCentral format
         # to the internal settings format
-        self.update_auth_settings(EI_ACCESS_TOKEN, {
-                EI_ACCESS_TOKEN_VALUE: payload[IMPC_ACCESS_TOKEN],
-                EI_ACCESS_TOKEN_EXPIRES_AT: payload[IMPC_EXPIRES_AT],
-                EI_REFRESH_TOKEN: payload[IMPC_REFRESH_TOKEN]
-            })
-        auth = self.load_auth_settings()
-        # initialize builder settings on user auth complete
-        if not auth.get(EI_BUILDER_SETTINGS):
-            self.update_auth_settings(EI_BUILDER_SETTINGS,
-                {
-                    EI_GITHUB_USER: None,
-                    EI_GITHUB_TOKEN: None
+        with self.auth_settings_transaction() as auth:
+            auth.set(EI_ACCESS_TOKEN, {
+                    EI_ACCESS_TOKEN_VALUE: payload[IMPC_ACCESS_TOKEN],
+                    EI_ACCESS_TOKEN_EXPIRES_AT: payload[IMPC_EXPIRES_AT],
+                    EI_REFRESH_TOKEN: payload[IMPC_REFRESH_TOKEN]
                 })
+            # initialize builder settings on user auth complete
+            if not auth.get(EI_BUILDER_SETTINGS):
+                auth.set(EI_BUILDER_SETTINGS,
+                    {
+                        EI_GITHUB_USER: None,
+                        EI_GITHUB_TOKEN: None
+                    })
+        Env.token_refresh_scheduler().schedule(self.env)
         # check setting again
         self.on_action_complete()
 
@@ -1332,26 +2934,13 @@ class ImpRefreshTokenCommand(BaseElectricImpCommand):
         return expires > datetime.datetime.utcnow()
 
     def action(self):
-        refresh_token = self.env.project_manager.get_refresh_token()
-        # request to refresh an access token
-        request, error = ImpCentral(self.env).refresh_access_token(refresh_token)
+        # request to refresh an access token,
+        # it is usually renewed in background before this check fails
+        error = Env.token_refresh_scheduler().refresh(self.env)
         # Failed to refresh token reset credentials
         # Do not need to show dialog which offer to refresh token
         if self.check_imp_error(error, None, None, False):
             self.update_auth_settings(EI_ACCESS_TOKEN, None)
-            self.on_action_complete()
-            return
-        else:
-            # refresh token could be unexpectedly
-            # updated during request
-            if IMPC_REFRESH_TOKEN in request:
-                refresh_token = request[IMPC_REFRESH_TOKEN]
-            # save new settings
-            self.update_auth_settings(EI_ACCESS_TOKEN, {
-                    EI_ACCESS_TOKEN_VALUE: request[IMPC_ACCESS_TOKEN],
-                    EI_ACCESS_TOKEN_EXPIRES_AT: request[IMPC_EXPIRES_AT],
-                    EI_REFRESH_TOKEN: refresh_token
-                })
 
         # restart login process
         self.on_action_complete()
@@ -1361,6 +2950,9 @@ class ImpRefreshTokenCommand(BaseElectricImpCommand):
 #
 class ImpCreateNewProductCommand(BaseElectricImpCommand):
 
+    # the product details shown in the product picker
+    PRODUCT_FIELDS = {"product": ["name", "owner"]}
+
     @staticmethod
     def check(base):
         settings = base.load_settings()
@@ -1397,8 +2989,9 @@ class ImpCreateNewProductCommand(BaseElectricImpCommand):
             STR_FAILED_TO_CREATE_PRODUCT, STR_RETRY_CREATE_PRODUCT):
             return
 
-        self.update_settings(EI_PRODUCT_ID, product["id"])
-        self.update_settings(EI_DEVICE_GROUP_ID, None)
+        with self.settings_transaction() as settings:
+            settings.set(EI_PRODUCT_ID, product["id"])
+            settings.set(EI_DEVICE_GROUP_ID, None)
         self.on_action_complete()
 
     def on_product_name_provided(self, index, names, owner_id):
@@ -1419,16 +3012,25 @@ class ImpCreateNewProductCommand(BaseElectricImpCommand):
             self.select_collaborator()
         else:
             # Save selected product in the settings file
-            self.update_settings(EI_PRODUCT_ID, names[index-2][0])
-            self.update_settings(EI_DEVICE_GROUP_ID, None)
+            with self.settings_transaction() as settings:
+                settings.set(EI_PRODUCT_ID, names[index-2][0])
+                settings.set(EI_DEVICE_GROUP_ID, None)
 
             self.on_action_complete()
 
     def select_existing_product(self, collaborator=None):
         token = self.env.project_manager.get_access_token()
+        central = ImpCentralAsync(self.env)
+
+        # list products for all accounts
+        # while the account details are requested
+        products_request = None
+        if self.products is None:
+            products_request = central.list_products(token, fields=self.PRODUCT_FIELDS)
+
         if collaborator is None:
             # get current account details
-            account, error = ImpCentral(self.env).account(token)
+            account, error = central.account(token).result()
             if error:
                 if self.check_imp_error(error,
                     STR_FAILED_TO_GET_ACCOUNT_DETAILS, STR_RETRY_SELECT_PRODUCT):
@@ -1439,9 +3041,8 @@ class ImpCreateNewProductCommand(BaseElectricImpCommand):
         else:
             account = collaborator
 
-        if self.products is None:
-            # list products for all accounts
-            products, error = ImpCentral(self.env).list_products(token)
+        if products_request is not None:
+            products, error = products_request.result()
 
             # Handle imp central request errors
             if error:
@@ -1450,8 +3051,8 @@ class ImpCreateNewProductCommand(BaseElectricImpCommand):
                     return
                 self.select_existing_product(account)
                 return
+            self.products = products
 
-        self.products = products
         self.show_product_list(account.get("id"))
 
     def select_collaborator(self):
@@ -1500,7 +3101,7 @@ class ImpCreateNewProductCommand(BaseElectricImpCommand):
     def show_product_list(self, owner_id):
         products = []
         for item in self.products:
-            details = item["relationships"].get("owner")
+            details = item.get("relationships", {}).get("owner")
             if (details is not None):
                 if details["id"] == owner_id:
                     products.append(item)
@@ -1576,9 +3177,10 @@ class ImpCreateNewDeviceGroupCommand(BaseElectricImpCommand):
             # the list of items does not contain the "new device group"
             # selection option which has index == 0
             id = items[index-1][0]
-            self.update_settings(EI_DEVICE_GROUP_ID, id)
-            # Force to propose code loading from the web
-            self.update_settings(EI_DEPLOYMENT_ID, None)
+            with self.settings_transaction() as settings:
+                settings.set(EI_DEVICE_GROUP_ID, id)
+                # Force to propose code loading from the web
+                settings.set(EI_DEPLOYMENT_ID, None)
             self.on_action_complete()
 
     def on_create_new_device_group(self, show_dialog=True):
@@ -1600,26 +3202,66 @@ class ImpCreateNewDeviceGroupCommand(BaseElectricImpCommand):
             STR_RETRY_TO_GET_DEVICE_GROUP):
             return
 
-        self.update_settings(EI_DEVICE_GROUP_ID, device_group["id"])
-        self.update_settings(EI_DEPLOYMENT_ID, EI_DEPLOYMENT_NEW)
+        with self.settings_transaction() as settings:
+            settings.set(EI_DEVICE_GROUP_ID, device_group["id"])
+            settings.set(EI_DEPLOYMENT_ID, EI_DEPLOYMENT_NEW)
         self.on_action_complete()
 
 class ImpSelectDeviceCommand(BaseElectricImpCommand):
+
+    # the device details shown in the device pickers
+    DEVICE_FIELDS = {"device": ["name", "device_online", "agent_id", "devicegroup"]}
+
+    @staticmethod
+    def get_device_label(device):
+        return (str("( on)" if device["attributes"].get("device_online") else "(off)") + " - " +
+                str(device.get("id")) + " - " +
+                str(device["attributes"]["name"]))
+
     def select_device_panel(self, devices, skip_for_single_device=False):
         # filter devices locally
-        all_names = [(
-            str("( on)" if device["attributes"].get("device_online") else "(off)") + " - " +
-            str(device.get("id")) + " - " +
-            str(device["attributes"]["name"])) for device in devices]
+        all_names = [self.get_device_label(device) for device in devices]
         # make a new product creation option as a part of the product select menu
         if len(devices) == 1 and skip_for_single_device:
             self.on_device_name_provided(0, devices)
         else:
             self.window.show_quick_panel(all_names, lambda id: self.on_device_name_provided(id, devices))
 
+    def select_devices_panel(self, devices, selected=None, selected_index=0):
+        # the quick panel supports a single item selection only,
+        # therefore the panel is re-opened to toggle one device at a time
+        # and the first item applies the selection
+        selected = selected if selected is not None else set()
+        all_names = [STR_DEVICES_APPLY_SELECTION.format(len(selected))] + [
+            (STR_DEVICE_SELECTED if index in selected else STR_DEVICE_NOT_SELECTED) +
+            self.get_device_label(device) for index, device in enumerate(devices)]
+        self.window.show_quick_panel(all_names,
+            lambda id: self.on_devices_panel_item_selected(id, devices, selected),
+            0, selected_index)
+
+    def on_devices_panel_item_selected(self, index, devices, selected):
+        # prevent wrong index which
+        # happen on cancel
+        if (index < 0 or index > len(devices)):
+            return
+
+        if index == 0:
+            if len(selected) > 0:
+                self.on_devices_selected([devices[i] for i in sorted(selected)], devices)
+            return
+
+        # the first item is the apply selection option
+        device_index = index - 1
+        if device_index in selected:
+            selected.remove(device_index)
+        else:
+            selected.add(device_index)
+        # the panel can't be re-opened from its own callback
+        sublime.set_timeout(lambda: self.select_devices_panel(devices, selected, index), 0)
+
 #
 # Request all registered devices and assign
-# one of that devices to the device group
+# the selected devices to the device group
 # Note: action should trigger logs restart
 #
 class ImpAssignDeviceCommand(ImpSelectDeviceCommand):
@@ -1627,39 +3269,37 @@ class ImpAssignDeviceCommand(ImpSelectDeviceCommand):
     def action(self):
         sublime.set_timeout_async(lambda: self.select_existing_device(), 0)
 
-    def on_device_name_provided(self, index, devices):
-        # prevent wrong index which
-        # happen on cancel
-        if (index < 0 or index >= len(devices)):
-            return
-
-        # there is no option for create new device
-        # therefore index maps on the devices correctly
-        device = devices[index]
-
+    def on_devices_selected(self, selected_devices, devices):
         settings = self.load_settings()
+        device_group_id = settings.get(EI_DEVICE_GROUP_ID)
 
         # Check that device is not in the device group yet
         # Note: devicegroup could be not defined
         #       if device was not assigned to any device group
-        device_group = device["relationships"].get("devicegroup")
-        if device_group and device_group["id"] == settings.get(EI_DEVICE_GROUP_ID):
-            # trigger restart if user assign the same device
+        new_devices = []
+        for device in selected_devices:
+            device_group = device.get("relationships", {}).get("devicegroup")
+            if not device_group or device_group["id"] != device_group_id:
+                new_devices.append(device)
+
+        if len(new_devices) == 0:
+            # trigger restart if user assign the same devices
             sublime.set_timeout_async(lambda: self.env.log_manager.reset(is_restart=True), 0)
             return
 
-        response, error = ImpCentral(self.env).assign_device(
+        # all the devices are assigned with a single request
+        response, error = ImpCentral(self.env).assign_devices(
             self.env.project_manager.get_access_token(),
-            settings.get(EI_DEVICE_GROUP_ID),
-            device["id"])
+            device_group_id,
+            [device["id"] for device in new_devices])
 
         # handle the respond
         if self.check_imp_error(error,
             STR_FAILED_TO_ASSIGN_DEVICE, None):
-            log_debug("Failed to add device to the group")
+            log_debug("Failed to add devices to the group")
             return
 
-        # Request log stream reset to add the devive to the log
+        # Request log stream reset to add the devices to the log
         #
         # Note: for another hand it is possible to attach the device
         #       to the logstream without stream reset, but it is
@@ -1675,7 +3315,8 @@ class ImpAssignDeviceCommand(ImpSelectDeviceCommand):
         # Get all available devices for the collaborator
         devices, error = ImpCentral(self.env).list_devices(
             self.env.project_manager.get_access_token(),
-            self.load_settings().get(EI_COLLABORATOR_ID))
+            self.load_settings().get(EI_COLLABORATOR_ID),
+            fields=self.DEVICE_FIELDS)
 
         # Check that code is correct
         if self.check_imp_error(error,
@@ -1688,7 +3329,7 @@ class ImpAssignDeviceCommand(ImpSelectDeviceCommand):
         # check that response has some payload
         # response should contain the list of devices
         if len(devices) > 0:
-            self.select_device_panel(devices)
+            self.select_devices_panel(devices)
 
 
 #
@@ -1700,22 +3341,15 @@ class ImpUnassignDeviceCommand(ImpSelectDeviceCommand):
     def action(self):
         self.select_existing_device()
 
-    def on_device_name_provided(self, index, devices):
-        # prevent wrong index which
-        # happen on cancel
-        if (index < 0 or index >= len(devices)):
-            log_debug("There is no device selected")
-            return
-        # there is no option for create new device
-        # therefore index maps on the names correctly
-        device = devices[index]
+    def on_devices_selected(self, selected_devices, devices):
         settings = self.load_settings()
 
-        # Remove the selected device from the devicegroup
-        response, error = ImpCentral(self.env).unassign_device(
+        # Remove the selected devices from the devicegroup
+        # with a single request
+        response, error = ImpCentral(self.env).unassign_devices(
             self.env.project_manager.get_access_token(),
             settings.get(EI_DEVICE_GROUP_ID),
-            device["id"])
+            [device["id"] for device in selected_devices])
 
         # handle the respond
         # the second error should happen if someone drop
@@ -1723,26 +3357,31 @@ class ImpUnassignDeviceCommand(ImpSelectDeviceCommand):
         if self.check_imp_error(error,
             STR_FAILED_TO_REMOVE_DEVICE,
             STR_RETRY_TO_REMOVE_DEVICE):
-            log_debug("Failed to remove device from the group")
+            log_debug("Failed to remove devices from the group")
             return
 
-        # Request log stream reset to remove the device from the log
+        # Request log stream reset to remove the devices from the log
         # Note: push to the background thread to prevent concurrent access
         #       to the logManager's fields
         sublime.set_timeout_async(lambda: self.env.log_manager.reset(is_restart=True), 0)
         # force log restart, but we need to reset current log first
-        if len(devices) > 1:
+        if len(devices) > len(selected_devices):
             sublime.set_timeout_async(lambda: update_log_windows(False), 0)
 
     def select_existing_device(self):
         settings = self.load_settings()
 
         # list devices for the current device group
-        devices, error = ImpCentral(self.env).list_devices(
-            self.env.project_manager.get_access_token(),
-            None, # owner is not required for unassign
-            settings[EI_DEVICE_GROUP_ID])
-
+        # without blocking the UI thread
+        ImpCentralAsync.on_complete(
+            ImpCentralAsync(self.env).list_devices(
+                self.env.project_manager.get_access_token(),
+                None, # owner is not required for unassign
+                settings[EI_DEVICE_GROUP_ID],
+                fields=self.DEVICE_FIELDS),
+            self.on_device_list_loaded)
+
+    def on_device_list_loaded(self, devices, error):
         # Check that code is correct
         if self.check_imp_error(error,
             STR_FAILED_TO_GET_DEVICELIST, None):
@@ -1752,7 +3391,7 @@ class ImpUnassignDeviceCommand(ImpSelectDeviceCommand):
         # response should contain the list of devices
         if len(devices) > 0:
             # filter devices locally
-            self.select_device_panel(devices)
+            self.select_devices_panel(devices)
         else:
             sublime.message_dialog(STR_MESSAGE_NO_DEVICE_IN_DEVICE_GROUP)
 
@@ -1784,40 +3423,82 @@ class ImpBuildAndRunCommand(BaseElectricImpCommand):
         device_code = self.read_file(device_filename)
 
         settings = self.load_settings()
+        code_hash = self.get_code_hash(agent_code, device_code)
+
+        if self.env.failed_deployment and self.env.failed_deployment[0] == code_hash:
+            # the same code has already failed to compile, no need to upload it again
+            self.print_to_tty(STR_STATUS_CODE_NOT_CHANGED_FAILED)
+            self.handle_deployment(None, self.env.failed_deployment[1])
+        elif self.is_code_deployed(settings, code_hash):
+            # nothing to upload, the devices could be restarted only
+            if sublime.ok_cancel_dialog(STR_CODE_NOT_CHANGED, STR_RESTART_DEVICES):
+                update_log_windows(False)
+                self.print_to_tty(STR_STATUS_CODE_NOT_CHANGED.format(settings.get(EI_DEPLOYMENT_ID)))
+                self.restart_devices(settings)
+        else:
+            # post a new deployment into the current devicegroup
+            deployment, error = ImpCentral(self.env).create_deployment(
+                self.env.project_manager.get_access_token(),
+                settings.get(EI_DEVICE_GROUP_ID),
+                agent_code,
+                device_code)
 
-        # post a new deployment into the current devicegroup
-        deployment, error = ImpCentral(self.env).create_deployment(
-            self.env.project_manager.get_access_token(),
-            settings.get(EI_DEVICE_GROUP_ID),
-            agent_code,
-            device_code)
-
-        self.handle_deployment(deployment, error)
+            self.handle_deployment(deployment, error, code_hash)
 
         self.update_status_message()
         self.on_action_complete()
 
+    @staticmethod
+    def get_code_hash(agent_code, device_code):
+        return hashlib.sha256((agent_code + "\0" + device_code).encode("utf-8")).hexdigest()
+
+    def is_code_deployed(self, settings, code_hash):
+        device_group_id = settings.get(EI_DEVICE_GROUP_ID)
+        deployment_id = settings.get(EI_DEPLOYMENT_ID)
+        if not deployment_id or settings.get(EI_DEPLOYED_CODE_HASHES, {}).get(device_group_id) != code_hash:
+            return False
+
+        # the code could be deployed into the device group from somewhere else
+        device_group, error = ImpCentral(self.env).get_device_group(
+            self.env.project_manager.get_access_token(), device_group_id)
+        if error:
+            return False
+        current = device_group.get("relationships", {}).get("current_deployment") or {}
+        return current.get("id") == deployment_id
+
+    def restart_devices(self, settings):
+        # note user about conditional restart request
+        self.print_to_tty(STR_DEVICE_GROUP_CONDITIONAL_RESTART)
+
+        # Now it's time to restart code on agent and devices
+        response, error = ImpCentral(self.env).conditional_restart(
+            self.env.project_manager.get_access_token(), settings.get(EI_DEVICE_GROUP_ID))
+
+        self.check_imp_error(error, STR_FAILED_CONDITIONAL_RESTART, None)
+
     # Handle deployment errors more carefully
-    def handle_deployment(self, deployment, error):
+    def handle_deployment(self, deployment, error, code_hash=None):
         settings = self.load_settings()
 
         # Update the logs first
         update_log_windows(False)
 
         if not error:
-            # save the current deployment
-            self.update_settings(EI_DEPLOYMENT_ID, deployment["id"])
+            self.env.failed_deployment = None
+            # save the current deployment and its code hash
+            with self.settings_transaction() as transaction:
+                transaction.set(EI_DEPLOYMENT_ID, deployment["id"])
+                code_hashes = transaction.get(EI_DEPLOYED_CODE_HASHES, {})
+                code_hashes[transaction.get(EI_DEVICE_GROUP_ID)] = code_hash
+                transaction.set(EI_DEPLOYED_CODE_HASHES, code_hashes)
+            try:
+                self.env.code_processor.save_deployment_source_maps(self.env, deployment["id"])
+            except OSError as error:
+                log_debug("Failed to keep the deployment source maps: " + str(error))
             # print the deployment to the status
             self.print_to_tty(STR_STATUS_REVISION_UPLOADED.format(str(deployment["attributes"]["sha"])))
-            # note user about conditional restart request
-            self.print_to_tty(STR_DEVICE_GROUP_CONDITIONAL_RESTART)
 
-            # Now it's time to restart code on agent and devices
-            response, error = ImpCentral(self.env).conditional_restart(
-                self.env.project_manager.get_access_token(), settings.get(EI_DEVICE_GROUP_ID))
-
-            if self.check_imp_error(error, STR_FAILED_CONDITIONAL_RESTART, None):
-                return
+            self.restart_devices(settings)
         else:
             # {
             # 	'error': {
@@ -1858,6 +3539,8 @@ class ImpBuildAndRunCommand(BaseElectricImpCommand):
                 return
 
             if error["code"] == ImpRequest.COMPILE_FAIL:
+                if code_hash:
+                    self.env.failed_deployment = (code_hash, error)
                 error_message = STR_ERR_DEPLOY_FAILED_WITH_ERRORS
                 compile_errors = error.get("errors")
                 # each error contain the meta array with
@@ -1916,6 +3599,45 @@ class ImpShowConsoleCommand(BaseElectricImpCommand):
         sublime.set_timeout_async(lambda: update_log_windows(False), 0)
 
 
+class ImpShowNetworkStatsCommand(BaseElectricImpCommand):
+    """Prints the impCentral requests statistics to the console"""
+
+    def run(self, cmd_on_complete=None, export=False):
+        # statistics do not require the cloud access
+        # therefore the settings check chain is skipped
+        self.init_env_and_settings()
+        self.env.ui_manager.init_tty()
+
+        stats = HTTP.stats().snapshot()
+        self.print_to_tty(STR_NETWORK_STATS_HEADER.format(stats["started"]))
+        if len(stats["endpoints"]) == 0:
+            self.print_to_tty(STR_NETWORK_STATS_EMPTY)
+
+        def format_latency(value):
+            return "-" if value is None else str(int(round(value)))
+
+        for name in sorted(stats["endpoints"]):
+            endpoint = stats["endpoints"][name]
+            codes = ", ".join(code + ": " + str(count) for code, count in sorted(endpoint["codes"].items()))
+            self.print_to_tty(STR_NETWORK_STATS_ENDPOINT.format(
+                name, endpoint["requests"], codes or "-", endpoint["retries"],
+                endpoint["bytes_out"], endpoint["bytes_in"],
+                format_latency(endpoint["p50_ms"]),
+                format_latency(endpoint["p95_ms"]),
+                format_latency(endpoint["p99_ms"]),
+                endpoint[NetworkStats.CACHE_HIT], endpoint[NetworkStats.CACHE_REVALIDATED],
+                endpoint[NetworkStats.COALESCED]))
+
+        if export:
+            build_dir = self.env.project_manager.get_build_directory_path()
+            if not os.path.exists(build_dir):
+                os.makedirs(build_dir)
+            filename = os.path.join(build_dir,
+                PR_NETWORK_STATS_PREFIX + datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + ".json")
+            ProjectManager.dump_map_to_json_file(filename, stats)
+            self.print_to_tty(STR_NETWORK_STATS_EXPORTED.format(filename))
+
+
 class ImpGetAgentUrlCommand(ImpSelectDeviceCommand):
 
     def action(self):
@@ -1940,11 +3662,16 @@ class ImpGetAgentUrlCommand(ImpSelectDeviceCommand):
         settings = self.load_settings()
 
         # list devices for the current device group
-        devices, error = ImpCentral(self.env).list_devices(
-            self.env.project_manager.get_access_token(),
-            None, # owner is not required
-            settings[EI_DEVICE_GROUP_ID])
-
+        # without blocking the UI thread
+        ImpCentralAsync.on_complete(
+            ImpCentralAsync(self.env).list_devices(
+                self.env.project_manager.get_access_token(),
+                None, # owner is not required
+                settings[EI_DEVICE_GROUP_ID],
+                fields=self.DEVICE_FIELDS),
+            self.on_device_list_loaded)
+
+    def on_device_list_loaded(self, devices, error):
         # Check that code is correct
         if self.check_imp_error(error,
             STR_FAILED_TO_GET_DEVICELIST, None):
@@ -2171,6 +3898,13 @@ class AnfReplaceCommand(sublime_plugin.TextCommand):
         self.view.replace(edit, sublime.Region(0, self.view.size()), content)
 
 
+# Removes the oldest part of the console
+class ImpTrimConsoleCommand(sublime_plugin.TextCommand):
+
+    def run(self, edit, size):
+        self.view.erase(edit, sublime.Region(0, size))
+
+
 class ImpErrorProcessor(sublime_plugin.EventListener):
 
     CLICKABLE_CP_ERROR_PATTERN = r".*\s*ERROR:\s*\[CLICKABLE\]\s.*\((.*)\:(\d+)\)"
@@ -2179,8 +3913,8 @@ class ImpErrorProcessor(sublime_plugin.EventListener):
     def on_post_text_command(self, view, command_name, args):
         window = view.window()
         env = Env.For(window)
-        if not env or view != env.terminal:
-            # Not a console window - nothing to do
+        if not env or view != env.terminal or command_name == "imp_trim_console":
+            # Not a console window or the console is trimmed - nothing to do
             return
         selected_line = view.substr(view.line(view.sel()[0]))
 
@@ -2247,6 +3981,7 @@ class ImpErrorProcessor(sublime_plugin.EventListener):
         env = Env.For(window)
         if not env:
             env = Env.get_existing_or_create_env_for(window)
+        env.prewarm()
         env.ui_manager.show_settings_value_in_status(EI_PRODUCT_ID, PL_PRODUCT_STATUS_KEY, STR_STATUS_ACTIVE_PRODUCT)
 
     def on_new(self, view):
@@ -2263,17 +3998,150 @@ def log_debug(text):
 
 
 def plugin_loaded():
-    global plugin_settings
+    global plugin_settings, ui_thread
     plugin_settings = sublime.load_settings(PL_SETTINGS_FILE)
+    ui_thread = threading.current_thread()
+    # start the access token renewal and prewarm the cloud access
+    # for the already opened projects
+    for window in sublime.windows():
+        if ProjectManager.is_electric_imp_project_window(window):
+            Env.get_existing_or_create_env_for(window).prewarm()
     update_log_windows()
 
 
+def plugin_unloaded():
+    global http_connection_pool, http_response_cache, imp_central_executor, token_refresh_scheduler, settings_cache
+    if settings_cache:
+        settings_cache.clear()
+    BuilderWorker.stop_all()
+    if token_refresh_scheduler:
+        token_refresh_scheduler.clear()
+    for env in list(project_env_map.values()):
+        env.log_manager.close_stream()
+    if imp_central_executor:
+        imp_central_executor.shutdown(wait=False)
+        imp_central_executor = None
+    if http_connection_pool:
+        http_connection_pool.clear()
+    if http_response_cache:
+        http_response_cache.clear()
+
+
+class LogStreamReader:
+    """Reads the log stream in a dedicated thread
+
+    The thread blocks on the stream socket and puts the received logs into
+    a queue, the log manager is notified only when new logs are received.
+    The thread closes the stream when the stream ends or the reader is stopped."""
+
+    # the end of the stream mark in the queue
+    CLOSED = None
+
+    def __init__(self, stream, sock, on_logs):
+        self.stream = stream
+        self.sock = sock
+        self.on_logs = on_logs
+        self.logs = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.__run, name="ImpLogStreamReader")
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        try:
+            # wake up the thread blocked on the socket
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except (AttributeError, OSError):
+            pass  # the stream is closed already, or the thread exits on the keep-alive timeout
+
+    def get_logs(self):
+        # returns the received logs and whether the stream has ended
+        logs = []
+        while True:
+            try:
+                log = self.logs.get_nowait()
+            except queue.Empty:
+                return logs, False
+            if log is self.CLOSED:
+                return logs, True
+            logs.append(log)
+
+    def __put(self, log):
+        self.logs.put(log)
+        if not self.stopped.is_set():
+            self.on_logs()
+
+    def __run(self):
+        try:
+            self.__read_events()
+        except (OSError, ValueError, http.client.HTTPException) as error:
+            # socket.timeout is raised if even keep-alive messages are not received
+            if not self.stopped.is_set():
+                log_debug("Log stream is dropped: " + str(error))
+        finally:
+            self.stream.close()
+            self.__put(self.CLOSED)
+
+    def __read_chunks(self):
+        # yields the stream data as soon as it is received
+        fp = self.stream.fp
+        if not self.stream.chunked:
+            while True:
+                data = fp.read1(PL_LOGS_READ_SIZE)
+                if not data:
+                    return
+                yield data
+
+        # the chunked transfer encoding: the size line, the data and CRLF
+        while True:
+            size_line = fp.readline(PL_LOGS_READ_SIZE)
+            if not size_line:
+                return
+            size = int(size_line.split(b";", 1)[0], 16)
+            if size == 0:
+                return
+            data = fp.read(size)
+            if len(data) < size:
+                return
+            fp.readline(PL_LOGS_READ_SIZE)
+            yield data
+
+    def __read_events(self):
+        parser = SseParser()
+        for chunk in self.__read_chunks():
+            if self.stopped.is_set():
+                return
+            for event in parser.feed(chunk):
+                # message data lines are joined with new lines, for example:
+                # data: log start message and pretty print like this {
+                # data:   value1: 123,
+                # data:   value2: 123
+                # data: }
+                if event.event == "message":
+                    self.__put(event.data + "\n")
+                elif event.event == "state_change":
+                    if event.data == "closed":
+                        self.__put("Stream was closed by server event.\n")
+                        return
+                    if event.data != "opened":
+                        self.__put(event.data + "\n")
+                else:
+                    log_debug("Unhandled event: " + event.event)
+
+
 class LogManager:
 
+    # the device details required to attach devices to the log stream
+    DEVICE_FIELDS = {"device": ["devicegroup"]}
+
     def __init__(self, env):
         self.env = env
         self.poll_url = None
         self.last_shown_log = None
+        self.stream = None
         self.sock = None
         self.devices = []
         self.has_logs = False
@@ -2286,8 +4154,12 @@ class LogManager:
         self.state = self.IDLE
         # prevent multiple requests when http is pending
         self.update_log_started = False
-        # no timer on start-up
-        self.keep_alive = None
+        # the log stream reader thread and whether it has notified about new logs
+        self.reader = None
+        self.reader_notified = False
+        self.reader_lock = threading.Lock()
+        # the access token renewal was tried for the stream
+        self.token_renewed = False
 
     def start(self):
         if self.state == self.IDLE:
@@ -2318,103 +4190,42 @@ class LogManager:
             return False
 
         # Handle invalid credentials use-case only
-        # the following string should restart logs via command
-        # which lead to access token renew
+        # try to renew the access token in background once,
+        # otherwise restart logs via command which lead to login
         if error["code"] == ImpRequest.INVALID_CREDENTIALS:
-            sublime.set_timeout_async(
-                lambda: self.env.window.run_command("imp_show_console", {"cmd_on_complete": "auth"}), 0)
+            sublime.set_timeout_async(self.renew_access_token, 0)
 
         return True
 
+    def renew_access_token(self):
+        if not self.token_renewed:
+            self.token_renewed = True
+            if not Env.token_refresh_scheduler().refresh(self.env):
+                update_log_windows(False)
+                return
+        self.env.window.run_command("imp_show_console", {"cmd_on_complete": "auth"})
+
+    def __on_reader_logs(self):
+        # called by the reader thread, wakes up the log update once per a batch of logs
+        with self.reader_lock:
+            if self.reader_notified:
+                return
+            self.reader_notified = True
+        sublime.set_timeout_async(self.update_logs, 0)
+
     def __read_logs(self):
-        if self.sock and type(self.sock) is not None and self.sock.fp is not None:
-            next_log = False
-            next_cmd = False
-            logs = []
-            log_message = ""
-            count = PL_LOGS_MAX_PER_REQUEST
-            while count > 0:
-                # lets read no more than coun logs per one loop
-                rd, wd, ed = select.select([self.sock], [], [], 0)
-                if not rd:
-                    break
-                else:
-                    for line in self.sock:
-                        if line == b'event: message\n':
-                            count -= 1
-                            if next_log and len(log_message) > 0:
-                                logs.append(log_message)
-                            log_message = ""
-                            next_log = True
-                            next_cmd = False
-                        elif line == b'event: state_change\n':
-                            count -= 1
-                            next_cmd = True
-                            next_log = False
-                        elif line == b'\n':
-                            next_log = False
-                            next_cmd = False
-                            break
-                        elif line == b': keep-alive\n':
-                            self.keep_alive = datetime.datetime.now()
-                            next_log = False
-                            next_cmd = False
-                        # if waiting for logs in a following format:
-                        # data: message\n
-                        # data: log start message and pretty print like this {\n
-                        # data:   value1: 123,\n
-                        # data:   value2: 123\n
-                        # data: }\n
-                        # \n
-                        elif next_log:
-                             message = line.decode("utf-8")
-                             if (message.find("data:") == 0):
-                                 log_message += message[6:]
-                             else:
-                                 # show unexpected messages too
-                                 log_message += message
-                        # if waiting for command
-                        elif next_cmd:
-                            next_cmd = False
-                            if line == b'data: closed\n':
-                                self.reset()
-                                logs.append("Stream was closed by server event.\n")
-                                return logs
-                            if line == b'data: opened\n':
-                                self.keep_alive = datetime.datetime.now()
-                                return logs
-                            if line != b'\n':
-                                logs.append(line.decode("utf-8"))
-                        else:
-                            log_debug("Unhandled command: " + str(line.decode("utf-8")))
-
-                        # append log to the list
-                        if not next_log and len(log_message) > 0:
-                            logs.append(log_message)
-                            log_message = ""
-
-                    # save log message on each exit from the for-loop
-                    if len(log_message) > 0:
-                        logs.append(log_message)
-                        log_message = ""
-
-            if len(logs) > 0:
-                # work around to keep stream active while logs are available
-                self.keep_alive = datetime.datetime.now()
-            elif self.keep_alive is not None:
-                # check that stream was not dropped
-                delta = datetime.datetime.now() - self.keep_alive
-                if delta.seconds > PL_KEEP_ALIVE_TIMEOUT:
-                    log_debug("Did not get keep alive on-time. Trigger log reset.")
-                    self.reset()
-
-            return logs
+        with self.reader_lock:
+            self.reader_notified = False
+        logs, closed = self.reader.get_logs()
+        if closed:
+            self.reset()
+        return logs
 
     def query_logs(self):
         log_request_time = False
 
-        # check if it is polling procedure
-        if self.sock and type(self.sock) is not None and self.sock.fp is not None:
+        # check if the log stream is being read
+        if self.reader:
             return {"logs": self.__read_logs()}
 
         #
@@ -2434,7 +4245,7 @@ class LogManager:
         if not self.poll_url:
             log_debug("Request devices")
             devices, error = ImpCentral(self.env).list_devices(
-                token, None, device_group_id)
+                token, None, device_group_id, fields=self.DEVICE_FIELDS)
 
             # Suppose that there is no logs if there is no device
             if self.check_imp_error(error):
@@ -2459,16 +4270,16 @@ class LogManager:
         self.poll_url = log_stream["id"]
 
         log_debug("Open stream")
-        self.sock = ImpCentral(self.env).open_log_stream(token, self.poll_url)
+        self.stream, self.sock = ImpCentral(self.env).open_log_stream(token, self.poll_url)
 
         # something went wrong, reset current state
-        if not self.sock:
+        if not self.stream:
             return None
 
         log_debug("Attach devices")
         # attach all devices from the device group to the logstream
         for device in self.devices:
-            if (device and ("devicegroup" in device.get("relationships")) and
+            if (device and ("devicegroup" in device.get("relationships", {})) and
                 (device_group_id == device["relationships"]["devicegroup"]["id"])):
 
                 response, error = ImpCentral(self.env).attach_device_to_log_stream(
@@ -2480,6 +4291,9 @@ class LogManager:
         log_debug("Logstream subscription done, start polling")
 
         self.state = self.POLL
+        self.token_renewed = False
+        self.reader = LogStreamReader(self.stream, self.sock, self.__on_reader_logs)
+        self.reader.start()
         self.write_to_console(STR_MESSAGE_LOG_STREAM_STARTED)
 
         start = None
@@ -2544,7 +4358,8 @@ class LogManager:
                 line_read = int(match.group(2)) - 1
                 try:
                     (orig_file, orig_line) = preprocessor.get_error_location(
-                        SourceType.AGENT if log["type"] == "agent.error" else SourceType.DEVICE, line_read, self.env)
+                        SourceType.AGENT if log["type"] == "agent.error" else SourceType.DEVICE, line_read, self.env,
+                        log.get("deployment"))
                     message = STR_ERR_RUNTIME_ERROR.format(func_name, orig_file, orig_line)
                 except:
                     pass  # Use original message if failed to translate the error location
@@ -2590,52 +4405,47 @@ class LogManager:
         # this action should force to close the log stream
         # but on the next request of logs stream should be
         # instantiated
-        if self.sock:
-            self.sock.close()
-        self.sock = None
+        self.close_stream()
         # reset poll url to reopen socket
         self.poll_url = None
         # last shown log could be different after device sassing
         # that's why log could be supplicated in the console
         # after device assign/an-assign
         self.last_shown_log = None
-        # stop timer
-        self.keep_alive = None
         # reset current state to idle
         self.stop(is_restart)
 
+    def close_stream(self):
+        # the reader thread closes the stream it reads
+        if self.reader:
+            self.reader.stop()
+        elif self.stream:
+            self.stream.close()
+        self.reader = None
+        self.stream = None
+        self.sock = None
+
 
 def update_log_windows(restart_timer=True):
     global project_env_map
-    time_start = datetime.datetime.now()
-    has_logs = False
     try:
         for (project_path, env) in list(project_env_map.items()):
             # Clean up project windows first
             if not ProjectManager.is_electric_imp_project_window(env.window):
                 # It's not a windows that corresponds to an EI project, remove it from the list
                 del project_env_map[project_path]
+                env.log_manager.close_stream()
                 log_debug("Removing project window: " + str(env.window) + ", total #: " + str(len(project_env_map)))
                 continue
 
-            # there are two use-cases when it is possible to get logs
-            # on first start on transition from (IDLE -> INIT -> POLL)
-            # and on  POLL
-            if env.log_manager.state == env.log_manager.POLL:
-                env.log_manager.update_logs()
-                has_logs = True
-            elif env.log_manager.state == env.log_manager.IDLE and not restart_timer:
+            # the logs are started from the IDLE state (IDLE -> INIT -> POLL),
+            # the stream reader thread updates the logs in the POLL state
+            if env.log_manager.state == env.log_manager.IDLE and not restart_timer:
                 env.log_manager.start()
                 env.log_manager.update_logs()
-                has_logs = True
-            # skip logs request for the IDLE and FAIL states
+            # skip logs request for the INIT, POLL and FAIL states
     finally:
         if restart_timer:
-            # keep on reading logs while logs are available
-            # and keep on log polling once per second
-            ms = PL_LOGS_UPDATE_LONG_PERIOD
-            if has_logs:
-                ms = PL_LOGS_UPDATE_SHORT_PERIOD
-
-            sublime.set_timeout(update_log_windows, ms)
+            # keep on checking the project windows once per second
+            sublime.set_timeout(update_log_windows, PL_LOGS_UPDATE_LONG_PERIOD)
     return True
@@ -0,0 +1,84 @@
+// MIT License
+//
+// Copyright 2018 Electric Imp
+//
+// SPDX-License-Identifier: MIT
+//
+// Long-lived Builder worker of the Electric Imp Sublime plug-in.
+//
+// Usage: node builder_worker.js <Builder module directory>
+//
+// Reads the preprocessing requests as JSON lines from stdin:
+//     {"id": 1, "ping": true}
+//     {"id": 2, "file": "/path/agent.nut", "lineControl": true, "defines": {}, "github": {"user": "", "token": ""}}
+// and writes the responses as JSON lines to stdout:
+//     {"id": 1, "pong": true}
+//     {"id": 2, "output": "...", "errors": ""}
+// The worker exits when stdin is closed.
+
+'use strict';
+
+const readline = require('readline');
+const util = require('util');
+
+// stdout is reserved for the responses
+const toStderr = function() {
+    process.stderr.write(util.format.apply(util, arguments) + '\n');
+};
+console.log = console.info = console.warn = console.error = console.debug = toStderr;
+
+let Builder;
+try {
+    Builder = require(process.argv[2]);
+} catch (e) {
+    process.stdout.write(JSON.stringify({fatal: 'Failed to load the Builder module: ' + e.message}) + '\n');
+    process.exit(1);
+}
+
+function preprocess(request) {
+    // the Builder command line tool fails on any error or warning output
+    const messages = [];
+    const report = function(message) {
+        messages.push(String(message));
+    };
+
+    // a new Builder per request does not keep any state between the builds
+    const builder = new Builder();
+    builder.logger = {debug: function() {}, info: function() {}, warning: report, error: report};
+    builder.machine.generateLineControlStatements = !!request.lineControl;
+    if (request.github && request.github.user && request.github.token) {
+        builder.machine.readers.github.username = request.github.user;
+        builder.machine.readers.github.token = request.github.token;
+    }
+
+    const source = '@include "' + request.file.replace(/"/g, '\\"') + '"';
+    const output = builder.machine.execute(source, request.defines || {});
+    return {output: output, errors: messages.join('\n')};
+}
+
+readline.createInterface({input: process.stdin})
+    .on('line', function(line) {
+        let request;
+        try {
+            request = JSON.parse(line);
+        } catch (e) {
+            return;
+        }
+
+        const response = {id: request.id};
+        if (request.ping) {
+            response.pong = true;
+        } else {
+            try {
+                const result = preprocess(request);
+                response.output = result.output;
+                response.errors = result.errors;
+            } catch (e) {
+                response.errors = e.message;
+            }
+        }
+        process.stdout.write(JSON.stringify(response) + '\n');
+    })
+    .on('close', function() {
+        process.exit(0);
+    });
@@ -0,0 +1,91 @@
+import collections
+
+# A dispatched server-sent event, the type is "message" if the event field is not set
+SseEvent = collections.namedtuple("SseEvent", ["event", "data", "id"])
+
+
+class SseParser:
+    """Incremental server-sent events (text/event-stream) parser
+
+    The parser is fed with the byte chunks as they are received from the
+    stream, the chunks could split the lines and the events at any byte.
+    The incomplete line is kept in the buffer until the next chunk.
+    Follows the event stream interpretation of the HTML specification:
+    the lines end with CRLF, LF or CR, the comment lines start with a
+    colon, the data fields of an event are joined with LF and the events
+    without data are not dispatched.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        # the last line of the previous chunk ended with CR, skip LF of CRLF
+        self.skip_lf = False
+        self.event_type = ""
+        self.data = []
+        # the last event id and the reconnection time in ms are kept between the events
+        self.last_event_id = ""
+        self.retry = None
+        # comment lines, e.g. keep-alive messages
+        self.comments = 0
+
+    def feed(self, chunk):
+        # returns the list of events completed by the chunk
+        buffer = self.buffer
+        buffer += chunk
+        if self.skip_lf and buffer:
+            if buffer[0] == 0x0A:
+                del buffer[0]
+            self.skip_lf = False
+
+        # the complete lines are decoded at once, the line ends are ASCII
+        # so they never split a multi-byte character
+        end = max(buffer.rfind(b"\n"), buffer.rfind(b"\r"))
+        if end < 0:
+            return []
+        view = memoryview(buffer)
+        try:
+            text = str(view[:end + 1], "utf-8", "replace")
+        finally:
+            view.release()
+        self.skip_lf = buffer[end] == 0x0D and end + 1 == len(buffer)
+        del buffer[:end + 1]
+
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+        # the most common lines are checked first
+        events = []
+        data = self.data
+        for line in text[:-1].split("\n"):
+            head = line[:6]
+            if head == "data: ":
+                data.append(line[6:])
+            elif not line:
+                if data:
+                    events.append(SseEvent(self.event_type or "message", "\n".join(data), self.last_event_id))
+                    data = self.data = []
+                self.event_type = ""
+            elif head == "event:":
+                self.event_type = line[7:] if line[6:7] == " " else line[6:]
+            elif head[0] == ":":
+                self.comments += 1
+            else:
+                self.__process_field(line)
+        return events
+
+    def __process_field(self, line):
+        field, colon, value = line.partition(":")
+        if value[:1] == " ":
+            value = value[1:]
+
+        if field == "data":
+            self.data.append(value)
+        elif field == "event":
+            self.event_type = value
+        elif field == "id":
+            if "\0" not in value:
+                self.last_event_id = value
+        elif field == "retry":
+            if value and not value.strip("0123456789"):
+                self.retry = int(value)
+        # other fields are ignored
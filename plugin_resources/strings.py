@@ -40,6 +40,8 @@ STR_DEVICE_GROUP_CONFIRM_PULLING_CODE = "Do you want to pull the latest code rev
 STR_DEVICE_GROUP_DESCRIPTION          = "Devicegroup created from sublime plugin"
 
 STR_DEPLOYMENT_DESCRIPTION            = "Code from the sublime plugin."
+STR_CODE_NOT_CHANGED                  = "The agent and device code is not changed since the last deployment.\n\nRestart the devices of the device group without uploading the code?"
+STR_RESTART_DEVICES                   = "Restart"
 
 STR_REPLACE_CONFIG                    = """This plugin does not support an old version of the Builder API.\n\n
 Would you like to start with a new version of impCentral API?\n\n
@@ -49,9 +51,13 @@ STR_ERR_MESSAGE_LINE                 = "    ERROR: [CLICKABLE] {} ({}:{})\n"
 STR_ERR_DEPLOY_FAILED_WITH_ERRORS    = "\nDeploy failed because of the following errors:\n"
 STR_ERR_RUNTIME_ERROR                = "ERROR:   [CLICKABLE] at {} ({}:{})"
 STR_ERR_CONSOLE_NOT_FOUND            = "Couldn't find console to print: {}"
-STR_ERR_PREPROCESSING_ERROR          = "\nPreprocessing failed because of the following errors:\n    ERROR: [CLICKABLE] {}\n"
+STR_BUILD_CACHE_HIT                  = "Build cache hit: {} and its includes are not changed, the preprocessed code is reused"
+STR_BUILD_CACHE_MISS                 = "Build cache miss: preprocessing {}"
+STR_ERR_PREPROCESSING_ERROR          = "\nPreprocessing of {} failed because of the following errors:\n    ERROR: [CLICKABLE] {}\n"
 
 STR_STATUS_REVISION_UPLOADED         = "Revision uploaded: {}"
+STR_STATUS_CODE_NOT_CHANGED          = "The code is not changed since the deployment {}, skipped the upload"
+STR_STATUS_CODE_NOT_CHANGED_FAILED   = "The code is not changed since the last failed deployment, skipped the upload"
 STR_STATUS_CREATING_PROJECT          = "Creating project at {}"
 STR_STATUS_ACTIVE_PRODUCT            = "Product: {}"
 STR_STATUS_ACTION                    = "Command: {}"
@@ -75,6 +81,9 @@ STR_FAILED_TO_GET_DEVICE_GROUP       = "Failed to create device group: "
 STR_RETRY_TO_GET_DEVICE_GROUP        = "Wrong device group id. Type again ?"
 
 STR_FAILED_TO_ASSIGN_DEVICE          = "Failed to assign device: "
+STR_DEVICES_APPLY_SELECTION          = "> Apply to the selected devices ({})"
+STR_DEVICE_SELECTED                  = "[x] "
+STR_DEVICE_NOT_SELECTED              = "[ ] "
 STR_FAILED_TO_GET_DEVICELIST         = "Failed to extract list of devices: "
 
 STR_FAILED_TO_REMOVE_DEVICE          = "Failed to remove device from the group: "
@@ -90,6 +99,8 @@ STR_FAILED_TO_GET_DEPLOYMENT         = "Failed to load the latest deployment: "
 
 STR_FAILED_TOO_SHORT_CONTENT         = "Too short conten exception"
 STR_FAILED_RESOURCE_NOT_AVAILABLE    = "\n There is no Internet connection.\n Or requested resource not avialble."
+STR_FAILED_REQUEST_TIMEOUT           = "\n The impCentral request timed out. Please try again later."
+STR_FAILED_CLOUD_UNREACHABLE         = "\n The impCentral at {} is not reachable. Please check the Internet connection and the cloud url."
 
 STR_FAILED_CODE_DEPLOY               = "Code deploy failed because of the error: {}"
 
@@ -109,6 +120,11 @@ STR_MESSAGE_LOG_STREAM_STOPPED       = "Real-time logging has stopped. Please re
 STR_MESSAGE_LOG_STREAM_NOT_STARTED   = "Real-time logging not started. Please refresh to enable it again."
 STR_MESSAGE_NO_DEVICE_IN_DEVICE_GROUP= "There is no assigned devices in the current device group"
 
+STR_NETWORK_STATS_HEADER             = "\nimpCentral requests since {}:"
+STR_NETWORK_STATS_EMPTY              = "    No requests yet"
+STR_NETWORK_STATS_ENDPOINT           = "    {}\n        requests: {} ({}), retries: {}, bytes out/in: {}/{}, p50/p95/p99: {}/{}/{} ms, cache hits/revalidated: {}/{}, coalesced: {}"
+STR_NETWORK_STATS_EXPORTED           = "Network statistics exported to {}"
+
 STR_FAILED_TO_EXTRACT_COLLABORATORS   = "Failed to extract the list of collaborators."
 STR_FAILED_TO_EXTRACT_GRANTS          = "Failed to extract grants for the collaborator {}."
 STR_SELECT_COLLABORATOR               = "> Choose collaborator's project"
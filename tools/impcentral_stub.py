@@ -0,0 +1,744 @@
+# Copyright (c) 2018 Electric Imp
+# This file is licensed under the MIT License
+# http://opensource.org/licenses/MIT
+
+"""Local stand-in for the impCentral API v5 endpoints used by the plug-in.
+
+The server keeps a synthetic fleet in memory and serves the auth, accounts,
+products, devicegroups, devices, deployments, conditional_restart and
+logstream (server-sent events) endpoints with configurable latency and page
+sizes. It can also record a session against the real impCentral into a
+fixtures file and replay it later.
+
+Examples:
+
+    # synthetic fleet of 5000 devices, 20 items per page, 80ms latency
+    python3 tools/impcentral_stub.py --devices 5000 --page-size 20 --latency 80
+
+    # record a real session into the fixtures file
+    python3 tools/impcentral_stub.py --record https://api.electricimp.com/v5/ --fixtures session.json
+
+    # replay the recorded session
+    python3 tools/impcentral_stub.py --replay session.json
+
+Set "cloud-url" in the project settings/electric-imp.settings file to
+http://localhost:<port>/v5/ to point the plug-in at the stand-in.
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+API_PREFIX          = "/v5"
+IMPC_DATA_FORMAT    = "%Y-%m-%dT%H:%M:%S.%fZ"
+MAX_PAGE_SIZE       = 100
+KEEP_ALIVE_PERIOD   = 15  # sec
+BASE_URL_MARKER     = "{base-url}"
+TOKEN_MARKER        = "{token}"
+TOKEN_FIELDS        = ["access_token", "refresh_token"]
+COMPILE_ERROR_MARK  = "@stub-compile-error"
+
+
+def now_string(delta=0):
+    return (datetime.datetime.utcnow() + datetime.timedelta(seconds=delta)).strftime(IMPC_DATA_FORMAT)
+
+
+def error_body(code, title, detail):
+    return {"errors": [{"code": code, "title": title, "detail": detail}]}
+
+
+class Fleet:
+    """Synthetic impCentral account with products, device groups and devices"""
+
+    def __init__(self, devices, products, device_groups, token_ttl):
+        self.lock = threading.Lock()
+        self.token_ttl = token_ttl
+        self.tokens = {}
+        self.refresh_tokens = set()
+        self.account = {
+            "type": "account",
+            "id": "stub-account",
+            "attributes": {"username": "stub", "email": "stub@localhost", "name": "stub"}
+        }
+        self.products = []
+        self.device_groups = []
+        self.devices = []
+        self.deployments = {}
+        self.log_streams = {}
+
+        for p in range(products):
+            self.create_product("Product " + str(p), None)
+            for g in range(device_groups):
+                self.create_device_group(self.products[-1]["id"], "Device Group " + str(p) + "." + str(g))
+
+        for d in range(devices):
+            # leave every tenth device unassigned
+            group = None
+            if self.device_groups and d % 10:
+                group = self.device_groups[d % len(self.device_groups)]
+            self.devices.append({
+                "type": "device",
+                "id": "%016x" % (0x30000c2a69000000 + d),
+                "attributes": {
+                    "name": "device-" + str(d),
+                    "device_online": d % 3 != 0,
+                    "agent_id": "stubagent" + str(d),
+                    "mac_address": "0c:2a:69:%02x:%02x:%02x" % ((d >> 16) & 0xff, (d >> 8) & 0xff, d & 0xff),
+                    "imp_type": "imp004m",
+                    "swversion": "stub-software-version-38.0",
+                    "free_memory": 90000 + d % 1000,
+                    "rssi": -40 - d % 30,
+                    "ip_address": "10.0." + str((d >> 8) & 0xff) + "." + str(d & 0xff),
+                    "last_enrolled_at": now_string(-d),
+                    "device_state_changed_at": now_string(-d)
+                },
+                "relationships": {
+                    "devicegroup": {"type": group["type"], "id": group["id"]} if group else None,
+                    "product": group["relationships"]["product"] if group else None,
+                    "owner": {"type": "account", "id": self.account["id"]}
+                }
+            })
+
+    # --- auth ---
+
+    def issue_token(self, refresh_token=None):
+        access_token = uuid.uuid4().hex
+        refresh_token = refresh_token or uuid.uuid4().hex
+        with self.lock:
+            self.tokens[access_token] = time.time() + self.token_ttl
+            self.refresh_tokens.add(refresh_token)
+        return {
+            "access_token": access_token,
+            "expires_at": now_string(self.token_ttl),
+            "expires_in": self.token_ttl,
+            "refresh_token": refresh_token
+        }
+
+    def is_valid_token(self, token):
+        with self.lock:
+            expires = self.tokens.get(token)
+        return expires is not None and expires > time.time()
+
+    # --- resources ---
+
+    def create_product(self, name, owner_id):
+        product = {
+            "type": "product",
+            "id": str(uuid.uuid4()),
+            "attributes": {"name": name, "description": "", "created_at": now_string()},
+            "relationships": {"owner": {"type": "account", "id": owner_id or self.account["id"]}}
+        }
+        with self.lock:
+            self.products.append(product)
+        return product
+
+    def create_device_group(self, product_id, name, group_type="development_devicegroup"):
+        device_group = {
+            "type": group_type,
+            "id": str(uuid.uuid4()),
+            "attributes": {"name": name, "description": "", "created_at": now_string()},
+            "relationships": {"product": {"type": "product", "id": product_id}}
+        }
+        with self.lock:
+            self.device_groups.append(device_group)
+        return device_group
+
+    def find(self, items, item_id):
+        for item in items:
+            if item["id"] == item_id:
+                return item
+
+    def move_devices(self, device_group, device_ids, assign):
+        ids = set(device_ids)
+        with self.lock:
+            for device in self.devices:
+                if device["id"] not in ids:
+                    continue
+                if assign:
+                    device["relationships"]["devicegroup"] = {"type": device_group["type"], "id": device_group["id"]}
+                    device["relationships"]["product"] = device_group["relationships"]["product"]
+                else:
+                    current = device["relationships"].get("devicegroup")
+                    if current and current["id"] == device_group["id"]:
+                        device["relationships"]["devicegroup"] = None
+                        device["relationships"]["product"] = None
+
+    def create_deployment(self, device_group, agent_code, device_code):
+        deployment = {
+            "type": "deployment",
+            "id": str(uuid.uuid4()),
+            "attributes": {
+                "agent_code": agent_code,
+                "device_code": device_code,
+                "sha": hashlib.sha256((agent_code + device_code).encode("utf-8")).hexdigest(),
+                "origin": "sublime",
+                "created_at": now_string()
+            },
+            "relationships": {"devicegroup": {"type": device_group["type"], "id": device_group["id"]}}
+        }
+        with self.lock:
+            self.deployments[deployment["id"]] = deployment
+            device_group["relationships"]["current_deployment"] = {"type": "deployment", "id": deployment["id"]}
+        return deployment
+
+    def group_devices(self, device_group_id):
+        with self.lock:
+            return [device for device in self.devices
+                    if device["relationships"].get("devicegroup")
+                    and device["relationships"]["devicegroup"]["id"] == device_group_id]
+
+    # --- log streams ---
+
+    def create_log_stream(self):
+        stream = {"id": str(uuid.uuid4()), "devices": set(), "events": []}
+        with self.lock:
+            self.log_streams[stream["id"]] = stream
+        return stream
+
+    def push_log(self, device_ids, log_type, message):
+        with self.lock:
+            for stream in self.log_streams.values():
+                for device_id in device_ids:
+                    if device_id in stream["devices"]:
+                        line = device_id + " " + now_string() + " stub-deployment " + log_type + " " + message
+                        stream["events"].append(line)
+
+
+class Recorder:
+    """Records the proxied impCentral exchanges into the fixtures file
+
+    The tokens of the auth responses and of the proxied requests are never
+    written: the auth response token fields are replaced with the marker and
+    every entry is checked for the tokens seen during the session."""
+
+    def __init__(self, upstream, fixtures):
+        self.upstream = upstream.rstrip("/")
+        self.fixtures = fixtures
+        self.entries = []
+        self.secrets = set()
+        self.lock = threading.Lock()
+
+    def add_secret(self, secret):
+        if secret:
+            with self.lock:
+                self.secrets.add(secret)
+
+    def redact_auth_response(self, payload):
+        # remembers the issued tokens and replaces them with the marker
+        try:
+            body = json.loads(payload)
+        except ValueError:
+            return payload
+        if not isinstance(body, dict):
+            return payload
+        for field in TOKEN_FIELDS:
+            if body.get(field):
+                self.add_secret(body[field])
+                body[field] = TOKEN_MARKER
+        return json.dumps(body)
+
+    def contains_secret(self, entry):
+        text = json.dumps(entry)
+        return any(secret in text for secret in self.secrets)
+
+    def add(self, entry):
+        with self.lock:
+            if self.contains_secret(entry):
+                # never expected, the entry is dropped rather than leaking the token
+                print("Fixture of " + entry["method"] + " " + entry["path"] + " contains a token, not recorded")
+                return
+            self.entries.append(entry)
+            with open(self.fixtures, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2)
+
+
+class Replayer:
+    """Serves the recorded impCentral exchanges in the recorded order"""
+
+    def __init__(self, fixtures):
+        with open(fixtures, encoding="utf-8") as f:
+            entries = json.load(f)
+        self.entries = {}
+        self.positions = {}
+        self.lock = threading.Lock()
+        for entry in entries:
+            self.entries.setdefault((entry["method"], entry["path"]), []).append(entry)
+
+    def next(self, method, path):
+        key = (method, path)
+        with self.lock:
+            entries = self.entries.get(key)
+            if not entries:
+                return None
+            # repeat the last recorded response when the replay goes further
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+            return entries[min(position, len(entries) - 1)]
+
+
+class StubServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options, fleet, recorder=None, replayer=None):
+        HTTPServer.__init__(self, address, StubRequestHandler)
+        self.options = options
+        self.fleet = fleet
+        self.recorder = recorder
+        self.replayer = replayer
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    ROUTES = [
+        ("POST",   r"/auth$",                                       "auth"),
+        ("POST",   r"/auth/token$",                                 "refresh_token"),
+        ("GET",    r"/accounts/?$",                                 "list_accounts"),
+        ("GET",    r"/accounts/([^/]+)$",                           "get_account"),
+        ("GET",    r"/products$",                                   "list_products"),
+        ("POST",   r"/products$",                                   "create_product"),
+        ("GET",    r"/devicegroups$",                               "list_device_groups"),
+        ("POST",   r"/devicegroups$",                               "create_device_group"),
+        ("GET",    r"/devicegroups/([^/]+)$",                       "get_device_group"),
+        ("POST",   r"/devicegroups/([^/]+)/relationships/devices$", "assign_devices"),
+        ("DELETE", r"/devicegroups/([^/]+)/relationships/devices$", "unassign_devices"),
+        ("POST",   r"/devicegroups/([^/]+)/conditional_restart$",   "conditional_restart"),
+        ("GET",    r"/devices$",                                    "list_devices"),
+        ("GET",    r"/devices/([^/]+)$",                            "get_device"),
+        ("POST",   r"/deployments$",                                "create_deployment"),
+        ("GET",    r"/deployments/([^/]+)$",                        "get_deployment"),
+        ("POST",   r"/logstream$",                                  "create_log_stream"),
+        ("GET",    r"/logstream/([^/]+)$",                          "open_log_stream"),
+        ("PUT",    r"/logstream/([^/]+)/([^/]+)$",                  "attach_device")
+    ]
+    PUBLIC_ROUTES = ["auth", "refresh_token"]
+    LOG_STREAM_ROUTES = ["create_log_stream", "open_log_stream", "attach_device"]
+
+    def log_message(self, format, *args):
+        if not self.server.options.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_PUT(self):
+        self.handle_request("PUT")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+    # --- helpers ---
+
+    def base_url(self):
+        return "http://" + (self.headers.get("Host") or "localhost") + API_PREFIX
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_json(self, code, body, extra_headers=None):
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        headers = dict(extra_headers or {})
+        if code == 200 and self.command == "GET" and payload:
+            etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                code, payload = 304, b""
+
+        self.send_response(code)
+        self.send_header("Content-Type", "application/vnd.api+json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def simulate_latency(self):
+        options = self.server.options
+        delay = options.latency + random.uniform(0, options.jitter)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def handle_request(self, method):
+        self.simulate_latency()
+        parts = urllib.parse.urlsplit(self.path)
+        if not parts.path.startswith(API_PREFIX):
+            return self.send_json(404, error_body("NF404", "Not Found", "Unknown api version"))
+
+        path = parts.path[len(API_PREFIX):]
+        # the plug-in builds some urls with a double slash
+        path = re.sub(r"/+", "/", path)
+        query = urllib.parse.parse_qs(parts.query)
+        body = self.read_body()
+
+        for route_method, pattern, name in self.ROUTES:
+            match = re.match(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            return self.send_json(404, error_body("NF404", "Not Found", "Unknown endpoint " + method + " " + path))
+
+        is_log_stream = name in self.LOG_STREAM_ROUTES
+        if self.server.recorder:
+            return self.proxy(method, body, name == "open_log_stream")
+        if self.server.replayer and not is_log_stream:
+            return self.replay(method, body)
+
+        if name not in self.PUBLIC_ROUTES:
+            authorization = self.headers.get("Authorization") or ""
+            if not self.server.fleet.is_valid_token(authorization.replace("Bearer ", "", 1)):
+                return self.send_json(401, error_body("PX100", "Invalid Credentials", "Invalid access token"))
+
+        try:
+            data = json.loads(body.decode("utf-8")) if body else {}
+        except ValueError:
+            return self.send_json(400, error_body("BX100", "Bad Request", "Malformed json body"))
+        getattr(self, "on_" + name)(query, data, *match.groups())
+
+    def paginate(self, items, query, resource_type):
+        size = int(query.get("page[size]", [self.server.options.page_size])[0])
+        size = max(1, min(size, MAX_PAGE_SIZE))
+        number = max(1, int(query.get("page[number]", ["1"])[0]))
+        last = max(1, (len(items) + size - 1) // size)
+
+        # sparse fieldsets
+        fields = query.get("fields[" + resource_type + "]")
+        page = items[(number - 1) * size:number * size]
+        if fields:
+            names = set(fields[0].split(","))
+            page = [{
+                "type": item["type"],
+                "id": item["id"],
+                "attributes": dict((k, v) for k, v in item["attributes"].items() if k in names),
+                "relationships": dict((k, v) for k, v in item["relationships"].items() if k in names)
+            } for item in page]
+
+        other = [(k, v[0]) for k, v in sorted(query.items()) if k != "page[number]"]
+        def page_link(n):
+            return self.base_url() + urllib.parse.urlsplit(self.path).path[len(API_PREFIX):] + "?" + \
+                "&".join(k + "=" + v for k, v in other + [("page[number]", str(n))])
+
+        links = {"self": page_link(number), "first": page_link(1), "last": page_link(last)}
+        if number < last:
+            links["next"] = page_link(number + 1)
+        self.send_json(200, {"data": page, "links": links})
+
+    @staticmethod
+    def filter_by(items, query, name):
+        value = query.get("filter[" + name + ".id]")
+        if not value:
+            return items
+        return [item for item in items
+                if item["relationships"].get(name) and item["relationships"][name]["id"] == value[0]]
+
+    # --- auth ---
+
+    def on_auth(self, query, data):
+        password = self.server.options.password
+        if password is not None and data.get("password") != password:
+            return self.send_json(401, error_body("PX100", "Invalid Credentials", "Wrong user name or password"))
+        self.send_json(200, self.server.fleet.issue_token())
+
+    def on_refresh_token(self, query, data):
+        if data.get("token") not in self.server.fleet.refresh_tokens:
+            return self.send_json(401, error_body("PX100", "Invalid Credentials", "Unknown refresh token"))
+        self.send_json(200, self.server.fleet.issue_token(data.get("token")))
+
+    # --- accounts ---
+
+    def on_list_accounts(self, query, data):
+        self.send_json(200, {"data": [self.server.fleet.account], "links": {}})
+
+    def on_get_account(self, query, data, account_id):
+        fleet = self.server.fleet
+        if account_id not in ["me", fleet.account["id"]]:
+            return self.send_json(404, error_body("NF404", "Not Found", "Unknown account"))
+        self.send_json(200, {"data": fleet.account})
+
+    # --- products ---
+
+    def on_list_products(self, query, data):
+        self.paginate(self.filter_by(list(self.server.fleet.products), query, "owner"), query, "product")
+
+    def on_create_product(self, query, data):
+        attributes = data.get("data", {}).get("attributes", {})
+        name = attributes.get("name")
+        if any(p["attributes"]["name"] == name for p in self.server.fleet.products):
+            return self.send_json(409, error_body("CX409", "Conflict", "Product name is already in use"))
+        owner = data["data"].get("relationships", {}).get("owner", {}).get("id")
+        self.send_json(201, {"data": self.server.fleet.create_product(name, owner)})
+
+    # --- device groups ---
+
+    def on_list_device_groups(self, query, data):
+        self.paginate(self.filter_by(list(self.server.fleet.device_groups), query, "product"),
+                      query, "development_devicegroup")
+
+    def on_create_device_group(self, query, data):
+        resource = data.get("data", {})
+        product_id = resource.get("relationships", {}).get("product", {}).get("id")
+        if not self.server.fleet.find(self.server.fleet.products, product_id):
+            return self.send_json(400, error_body("CX400", "Bad Request", "Unknown product"))
+        self.send_json(201, {"data": self.server.fleet.create_device_group(
+            product_id, resource.get("attributes", {}).get("name"), resource.get("type"))})
+
+    def get_device_group_or_fail(self, device_group_id):
+        device_group = self.server.fleet.find(self.server.fleet.device_groups, device_group_id)
+        if not device_group:
+            self.send_json(404, error_body("NF404", "Not Found", "Unknown device group"))
+        return device_group
+
+    def on_get_device_group(self, query, data, device_group_id):
+        device_group = self.get_device_group_or_fail(device_group_id)
+        if device_group:
+            self.send_json(200, {"data": device_group})
+
+    def on_assign_devices(self, query, data, device_group_id):
+        device_group = self.get_device_group_or_fail(device_group_id)
+        if device_group:
+            self.server.fleet.move_devices(device_group, [d["id"] for d in data.get("data", [])], True)
+            self.send_json(204, None)
+
+    def on_unassign_devices(self, query, data, device_group_id):
+        device_group = self.get_device_group_or_fail(device_group_id)
+        if device_group:
+            self.server.fleet.move_devices(device_group, [d["id"] for d in data.get("data", [])], False)
+            self.send_json(204, None)
+
+    def on_conditional_restart(self, query, data, device_group_id):
+        device_group = self.get_device_group_or_fail(device_group_id)
+        if device_group:
+            devices = self.server.fleet.group_devices(device_group_id)
+            self.server.fleet.push_log([d["id"] for d in devices], "server.status", "Device restarted")
+            self.send_json(202, None)
+
+    # --- devices ---
+
+    def on_list_devices(self, query, data):
+        devices = list(self.server.fleet.devices)
+        devices = self.filter_by(devices, query, "devicegroup")
+        if query.get("filter[account.id]"):
+            devices = self.filter_by(devices, {"filter[owner.id]": query["filter[account.id]"]}, "owner")
+        self.paginate(devices, query, "device")
+
+    def on_get_device(self, query, data, device_id):
+        device = self.server.fleet.find(self.server.fleet.devices, device_id)
+        if not device:
+            return self.send_json(404, error_body("NF404", "Not Found", "Unknown device"))
+        self.send_json(200, {"data": device})
+
+    # --- deployments ---
+
+    def on_create_deployment(self, query, data):
+        resource = data.get("data", {})
+        attributes = resource.get("attributes", {})
+        device_group_id = resource.get("relationships", {}).get("devicegroup", {}).get("id")
+        device_group = self.get_device_group_or_fail(device_group_id)
+        if not device_group:
+            return
+
+        errors = []
+        for target in ["agent_code", "device_code"]:
+            code = attributes.get(target) or ""
+            for row, line in enumerate(code.split("\n")):
+                if COMPILE_ERROR_MARK in line:
+                    errors.append({"file": target, "row": row + 1, "column": line.index(COMPILE_ERROR_MARK) + 1,
+                                   "text": "stub compilation error"})
+        if errors:
+            body = error_body("CX005", "Compilation Error", "Code compilation failed")
+            body["errors"][0]["meta"] = errors
+            return self.send_json(400, body)
+
+        deployment = self.server.fleet.create_deployment(
+            device_group, attributes.get("agent_code") or "", attributes.get("device_code") or "")
+        self.send_json(201, {"data": deployment})
+
+    def on_get_deployment(self, query, data, deployment_id):
+        deployment = self.server.fleet.deployments.get(deployment_id)
+        if not deployment:
+            return self.send_json(404, error_body("NF404", "Not Found", "Unknown deployment"))
+        self.send_json(200, {"data": deployment})
+
+    # --- log streams ---
+
+    def on_create_log_stream(self, query, data):
+        stream = self.server.fleet.create_log_stream()
+        self.send_json(200, {"data": {"type": "logstream", "id": stream["id"]}})
+
+    def on_attach_device(self, query, data, log_stream_id, device_id):
+        stream = self.server.fleet.log_streams.get(log_stream_id)
+        if not stream:
+            return self.send_json(404, error_body("NF404", "Not Found", "Unknown log stream"))
+        stream["devices"].add(device_id)
+        self.send_json(204, None)
+
+    def on_open_log_stream(self, query, data, log_stream_id):
+        stream = self.server.fleet.log_streams.get(log_stream_id)
+        if not stream:
+            return self.send_json(404, error_body("NF404", "Not Found", "Unknown log stream"))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        rate = self.server.options.log_rate
+        period = 1.0 / rate if rate > 0 else KEEP_ALIVE_PERIOD
+        keep_alive = time.time()
+        counter = 0
+        try:
+            self.write_event("state_change", "opened")
+            while True:
+                time.sleep(min(period, KEEP_ALIVE_PERIOD))
+                # queued events go first, e.g. conditional restart notifications
+                while stream["events"]:
+                    self.write_event("message", stream["events"].pop(0))
+                devices = sorted(stream["devices"])
+                if rate > 0 and devices:
+                    counter += 1
+                    device_id = devices[counter % len(devices)]
+                    self.write_event("message", device_id + " " + now_string() +
+                                     " stub-deployment server.log stub log message #" + str(counter))
+                if time.time() - keep_alive >= KEEP_ALIVE_PERIOD:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    keep_alive = time.time()
+        except (BrokenPipeError, ConnectionResetError):
+            # the client has closed the stream
+            pass
+        finally:
+            self.close_connection = True
+
+    def write_event(self, event, data):
+        lines = ["event: " + event] + ["data: " + line for line in data.split("\n")]
+        self.wfile.write(("\n".join(lines) + "\n\n").encode("utf-8"))
+        self.wfile.flush()
+
+    # --- record/replay ---
+
+    def proxy(self, method, body, is_stream):
+        recorder = self.server.recorder
+        path = re.sub(r"^" + API_PREFIX, "", self.path)
+        request = urllib.request.Request(recorder.upstream + path, data=body or None, method=method)
+        for name in ["Authorization", "Content-Type", "If-None-Match", "User-Agent"]:
+            if self.headers.get(name):
+                request.add_header(name, self.headers.get(name))
+        recorder.add_secret((self.headers.get("Authorization") or "").replace("Bearer ", "", 1).strip())
+
+        try:
+            response = urllib.request.urlopen(request)
+        except urllib.error.HTTPError as err:
+            response = err
+
+        if is_stream and response.getcode() == 200:
+            # log streams are proxied live and are not recorded
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                for line in response:
+                    self.wfile.write(line)
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            self.close_connection = True
+            return
+
+        payload = response.read().decode("utf-8")
+        # keep pagination links pointing at the stand-in
+        payload = payload.replace(recorder.upstream, BASE_URL_MARKER)
+        is_auth = path.startswith("/auth")
+        entry = {
+            "method": method,
+            "path": path,
+            # do not keep the credentials in the fixtures
+            "request": None if is_auth else body.decode("utf-8"),
+            "status": response.getcode(),
+            "etag": response.headers.get("ETag"),
+            "body": recorder.redact_auth_response(payload) if is_auth else payload
+        }
+        recorder.add(entry)
+        # the client gets the real tokens
+        self.send_fixture(dict(entry, body=payload))
+
+    def replay(self, method, body):
+        path = re.sub(r"^" + API_PREFIX, "", self.path)
+        entry = self.server.replayer.next(method, path)
+        if entry is None:
+            return self.send_json(404, error_body("NF404", "Not Found", "No fixture for " + method + " " + path))
+        if path.startswith("/auth") and TOKEN_MARKER in entry["body"]:
+            # the recorded tokens are not kept, issue the tokens the log stream endpoints accept
+            try:
+                refresh_token = json.loads(body.decode("utf-8")).get("token") if body else None
+            except ValueError:
+                refresh_token = None
+            auth = json.loads(entry["body"])
+            auth.update((field, value) for field, value in self.server.fleet.issue_token(refresh_token).items()
+                        if field in TOKEN_FIELDS)
+            entry = dict(entry, body=json.dumps(auth))
+        self.send_fixture(entry)
+
+    def send_fixture(self, entry):
+        payload = entry["body"].replace(BASE_URL_MARKER, self.base_url()).encode("utf-8")
+        self.send_response(entry["status"])
+        self.send_header("Content-Type", "application/vnd.api+json")
+        self.send_header("Content-Length", str(len(payload)))
+        if entry.get("etag"):
+            self.send_header("ETag", entry["etag"])
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local impCentral API v5 stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--devices", type=int, default=100, help="synthetic fleet size")
+    parser.add_argument("--products", type=int, default=3)
+    parser.add_argument("--device-groups", type=int, default=2, help="device groups per product")
+    parser.add_argument("--page-size", type=int, default=20, help="default page size of the lists")
+    parser.add_argument("--latency", type=float, default=0, help="added latency of each request, ms")
+    parser.add_argument("--jitter", type=float, default=0, help="random extra latency up to the value, ms")
+    parser.add_argument("--log-rate", type=float, default=1, help="log messages per second per stream")
+    parser.add_argument("--token-ttl", type=int, default=3600, help="access token lifetime, sec")
+    parser.add_argument("--password", default=None, help="accept only this password")
+    parser.add_argument("--record", metavar="UPSTREAM", help="proxy to the upstream api and record fixtures")
+    parser.add_argument("--replay", metavar="FIXTURES", help="serve the recorded fixtures")
+    parser.add_argument("--fixtures", default="impcentral-fixtures.json", help="fixtures file to record")
+    parser.add_argument("--quiet", action="store_true", help="do not log requests")
+    options = parser.parse_args()
+
+    fleet = Fleet(options.devices, options.products, options.device_groups, options.token_ttl)
+    recorder = Recorder(options.record, options.fixtures) if options.record else None
+    replayer = Replayer(options.replay) if options.replay else None
+
+    server = StubServer((options.host, options.port), options, fleet, recorder, replayer)
+    print("impCentral stand-in is listening at http://" + options.host + ":" + str(server.server_port) +
+          API_PREFIX + "/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
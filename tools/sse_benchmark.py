@@ -0,0 +1,144 @@
+# Copyright (c) 2018 Electric Imp
+# This file is licensed under the MIT License
+# http://opensource.org/licenses/MIT
+
+"""Throughput benchmark of the log stream (server-sent events) parser.
+
+Feeds a large log stream capture to the incremental SseParser of the
+plug-in in chunks of the given size and reports the parsed events per
+second. The line by line parsing of the HTTP response used by the
+plug-in before is measured on the same capture for comparison.
+
+Examples:
+
+    # synthetic capture of 200000 log messages, 4KB chunks
+    python3 tools/sse_benchmark.py --events 200000 --chunk-size 4096
+
+    # capture of a real log stream, e.g. saved from the stand-in with
+    # curl -N -H "Authorization: Bearer <token>" http://localhost:8080/v5/logstream/<id> > capture.txt
+    python3 tools/sse_benchmark.py --capture capture.txt
+"""
+
+import argparse
+import http.client
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugin_resources.sse_parser import SseParser
+
+
+def make_capture(events, multiline_ratio, seed):
+    # the impCentral log stream format with keep-alive comments and pretty printed multi-line logs
+    rnd = random.Random(seed)
+    parts = [b": keep-alive\n\n", b"event: state_change\ndata: opened\n\n"]
+    for i in range(events):
+        device = "%016x" % rnd.randrange(1 << 56)
+        header = "data: " + device + " 2018-06-01T10:00:00.000Z 6f9bd1a0-0000-4000-8000-000000000000 server.log "
+        if rnd.random() < multiline_ratio:
+            message = header + "table {\ndata:   value1: " + str(i) + ",\ndata:   value2: " + str(i * 2) + "\ndata: }\n"
+        else:
+            message = header + "log message #" + str(i) + " " + "x" * rnd.randrange(10, 120) + "\n"
+        parts.append(("event: message\n" + message + "\n").encode("utf-8"))
+        if i % 1000 == 999:
+            parts.append(b": keep-alive\n\n")
+    return b"".join(parts)
+
+
+def parse_incremental(capture, chunk_size):
+    parser = SseParser()
+    view = memoryview(capture)
+    count = 0
+    for start in range(0, len(capture), chunk_size):
+        count += len(parser.feed(view[start:start + chunk_size]))
+    return count
+
+
+class CaptureSocket:
+    # serves the capture as the log stream HTTP response
+    def __init__(self, capture, chunk_size):
+        self.data = b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nConnection: close\r\n\r\n" + capture
+        self.chunk_size = chunk_size
+
+    def makefile(self, mode, *args, **kwargs):
+        return io.BufferedReader(io.BytesIO(self.data), self.chunk_size)
+
+
+def parse_line_by_line(capture, chunk_size):
+    # the log stream parsing of the plug-in before SseParser
+    response = http.client.HTTPResponse(CaptureSocket(capture, chunk_size))
+    response.begin()
+    count = 0
+    next_log = False
+    next_cmd = False
+    log_message = ""
+    for line in response:
+        if line == b'event: message\n':
+            if next_log and len(log_message) > 0:
+                count += 1
+            log_message = ""
+            next_log = True
+            next_cmd = False
+        elif line == b'event: state_change\n':
+            next_cmd = True
+            next_log = False
+        elif line == b'\n':
+            next_log = False
+            next_cmd = False
+        elif line == b': keep-alive\n':
+            next_log = False
+            next_cmd = False
+        elif next_log:
+            message = line.decode("utf-8")
+            if message.find("data:") == 0:
+                log_message += message[6:]
+            else:
+                log_message += message
+        elif next_cmd:
+            next_cmd = False
+            count += 1
+        if not next_log and len(log_message) > 0:
+            count += 1
+            log_message = ""
+    return count
+
+
+def measure(name, parse, capture, chunk_size, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = parse(capture, chunk_size)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print("{:<14} {:>9} events  {:>8.3f} s  {:>12,.0f} events/s  {:>8.1f} MB/s".format(
+        name, count, best, count / best, len(capture) / best / 1e6))
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Log stream parser benchmark")
+    parser.add_argument("--capture", help="raw log stream capture file, synthetic if not set")
+    parser.add_argument("--events", type=int, default=100000, help="log messages of the synthetic capture")
+    parser.add_argument("--multiline", type=float, default=0.1, help="ratio of the multi-line messages")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="bytes fed to the parser at once")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each parser, the best is reported")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.capture:
+        with open(args.capture, "rb") as f:
+            capture = f.read()
+    else:
+        capture = make_capture(args.events, args.multiline, args.seed)
+    print("capture: {:,} bytes, chunk size: {} bytes".format(len(capture), args.chunk_size))
+
+    measure("SseParser", parse_incremental, capture, args.chunk_size, args.repeat)
+    measure("line by line", parse_line_by_line, capture, args.chunk_size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()